@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+
+Inter-rater agreement on the CVS criteria and the flags: Fleiss' kappa over
+all the annotators, Cohen's kappa and confusion matrix of every pair of
+annotators, and the frames on which they disagree.
+
+    python agreement.py --inputs alice.pickle bob.pickle carol.pickle [--json agreement.json] [--disagreements disagreements.csv]
+
+The inputs are read as by merge.py (--names gives the annotators of a .sqlite
+database). Only the frames seen by the annotators being compared are used.
+Set "disagreements": "disagreements.csv" in config.json to review these
+frames with the "Only Disagreements" navigation mode.
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from annotation_store import flag_fields
+from merge import read_annotations, Aligned_Annotations
+
+# the seen flag is not an annotation to agree on
+agreement_fields = [f for f in flag_fields if f != 'seen']
+
+_seen = flag_fields.index('seen')
+
+
+def confusion_matrices(a, b):
+    """ (n_fields, 2, 2) counts of the values of `a` (rows) against `b` (columns), both
+    (n_frames, n_fields) arrays of 0, 1 and -1 where a rater does not have the field """
+    n_fields = a.shape[1]
+    codes = (a.astype(np.int64) * 2 + b) + 4 * np.arange(n_fields)
+    # the fields one of the raters does not have go to an extra bin, dropped
+    codes[(a < 0) | (b < 0)] = 4 * n_fields
+    counts = np.bincount(codes.ravel(), minlength=4 * n_fields + 1)[:-1]
+    return counts.reshape(n_fields, 2, 2)
+
+
+def cohen_kappa(confusion):
+    """ Cohen's kappa of every (2, 2) confusion matrix, nan when the agreement
+    expected by chance is total (e.g. a flag that is never set) """
+    confusion = np.asarray(confusion, dtype=float)
+    n = confusion.sum(axis=(-2, -1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        observed = np.trace(confusion, axis1=-2, axis2=-1) / n
+        expected = (confusion.sum(axis=-1) * confusion.sum(axis=-2)).sum(axis=-1) / n ** 2
+        return (observed - expected) / (1 - expected)
+
+
+def fleiss_kappa(values):
+    """ Fleiss' kappa of every field of `values`, (n_raters, n_frames, n_fields) of 0, 1
+    and -1. A field is rated on the frames where all the raters have it """
+    n_raters = values.shape[0]
+    rated = (values >= 0).all(axis=0)
+    n_rated = rated.sum(axis=0)
+    ones = (values == 1).sum(axis=0).astype(float)
+    zeros = n_raters - ones
+    with np.errstate(invalid='ignore', divide='ignore'):
+        per_frame = (ones ** 2 + zeros ** 2 - n_raters) / (n_raters * (n_raters - 1))
+        observed = (per_frame * rated).sum(axis=0) / n_rated
+        p_one = (ones * rated).sum(axis=0) / (n_rated * n_raters)
+        expected = p_one ** 2 + (1 - p_one) ** 2
+        return (observed - expected) / (1 - expected)
+
+
+def _float(x):
+    """ json has no nan """
+    return None if np.isnan(x) else float(x)
+
+
+def compute_agreement(aligned, names, fields=agreement_fields):
+    """ {'fields', 'fleiss': {n_frames, kappa}, 'pairs': [{raters, n_frames, cohen, confusion}]}
+    over the frames seen by all the raters, respectively by both raters of a pair """
+    columns = [flag_fields.index(f) for f in fields]
+    values = aligned.values[:, :, columns]
+    seen = aligned.values[:, :, _seen] == 1
+
+    all_seen = seen.all(axis=0)
+    fleiss = fleiss_kappa(values[:, all_seen]) if len(names) > 1 else np.full(len(fields), np.nan)
+    result = {
+        'fields': list(fields),
+        'fleiss': {'n_frames': int(all_seen.sum()), 'kappa': {f: _float(k) for f, k in zip(fields, fleiss)}},
+        'pairs': [],
+        }
+
+    for i in range(len(names)):
+        for j in range(i + 1, len(names)):
+            both = seen[i] & seen[j]
+            confusion = confusion_matrices(values[i, both], values[j, both])
+            kappa = cohen_kappa(confusion)
+            result['pairs'].append({
+                'raters': [names[i], names[j]],
+                'n_frames': int(both.sum()),
+                'cohen': {f: _float(k) for f, k in zip(fields, kappa)},
+                # rows: values of the first rater, columns: values of the second
+                'confusion': {f: c.tolist() for f, c in zip(fields, confusion)},
+                })
+    return result
+
+
+def _field_lists(fields, masks):
+    """ the names of the fields set in every row of `masks`, space separated, joined once
+    per combination of fields rather than once per frame """
+    patterns = masks.astype(np.int64) @ (1 << np.arange(len(fields), dtype=np.int64))
+    unique, inverse = np.unique(patterns, return_inverse=True)
+    names = np.array([' '.join(f for j, f in enumerate(fields) if (p >> j) & 1) for p in unique], dtype=object)
+    return names[inverse]
+
+
+def find_disagreements(aligned, names, fields=agreement_fields):
+    """ DataFrame of the frames on which the raters who have seen them disagree, with
+    the fields they disagree on and the value of every rater on these fields """
+    columns = [flag_fields.index(f) for f in fields]
+    conflicts = aligned.conflicts()[:, columns]
+    frames = np.flatnonzero(conflicts.any(axis=1))
+    conflicts = conflicts[frames]
+
+    df = pd.DataFrame({
+        'video_id': np.asarray(aligned.video_ids, dtype=object)[aligned.keys[frames] >> 32],
+        'frame_id_int': (aligned.keys[frames] & 0xffffffff).astype(int),
+        'fields': _field_lists(fields, conflicts),
+        })
+    # the disputed fields set by every rater, e.g. "cvs_cri_1 out_of_body"
+    for i, name in enumerate(names):
+        df[name] = _field_lists(fields, conflicts & (aligned.values[i, frames][:, columns] == 1))
+    return df
+
+
+def format_agreement(result):
+    """ lines of text of a table of the kappas, Fleiss' then Cohen's of every pair """
+    lines = ['{:<24}{:>9}'.format('kappa', 'fleiss') + ''.join(
+             '{:>14}'.format('{}/{}'.format(*p['raters'])[:13]) for p in result['pairs'])]
+    lines.append('{:<24}{:>9}'.format('frames', result['fleiss']['n_frames']) +
+                 ''.join('{:>14}'.format(p['n_frames']) for p in result['pairs']))
+    for f in result['fields']:
+        kappas = [result['fleiss']['kappa'][f]] + [p['cohen'][f] for p in result['pairs']]
+        lines.append('{:<24}'.format(f) + '{:>9}'.format('-' if kappas[0] is None else '{:.3f}'.format(kappas[0])) +
+                     ''.join('{:>14}'.format('-' if k is None else '{:.3f}'.format(k)) for k in kappas[1:]))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agreement between annotators')
+    parser.add_argument('--inputs', nargs='+', required=True, help='annotations.pickle, .csv, .jsonl, .parquet or .sqlite')
+    parser.add_argument('--names', nargs='+', default=None, help='name of each input (annotator of a .sqlite), the file names by default')
+    parser.add_argument('--fields', nargs='+', default=agreement_fields, choices=agreement_fields)
+    parser.add_argument('--json', default=None, help='write the kappas and confusion matrices to this json file')
+    parser.add_argument('--disagreements', default=None, help='csv of the frames on which the annotators disagree')
+    args = parser.parse_args()
+
+    names = args.names or [os.path.splitext(os.path.basename(p))[0] for p in args.inputs]
+    assert len(names) == len(args.inputs), 'one name per input'
+    assert len(set(names)) == len(names), 'the inputs need different names'
+
+    aligned = Aligned_Annotations([read_annotations(p, n) for p, n in zip(args.inputs, names)])
+    result = compute_agreement(aligned, names, args.fields)
+    print('\n'.join(format_agreement(result)))
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=1)
+        print('INFO: agreement written to ', args.json)
+
+    disagreements = find_disagreements(aligned, names, args.fields)
+    print('INFO: {} frames with disagreements'.format(len(disagreements)))
+    if args.disagreements is not None:
+        disagreements.to_csv(args.disagreements, index=False)
+        print('INFO: disagreements written to ', args.disagreements)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+
+Progress of the annotation: seen frames, distribution of the CVS criteria,
+out-of-body and difficult frames, per video and for the whole dataset.
+
+    python annotation_stats.py --annotations annotations.pickle [--videos] [--json stats.json]
+
+The annotations are only read, the statistics can be computed while the
+annotation tool is running.
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+from annotation_store import flag_fields, flag_bits, status_bits
+from export import open_annotations
+
+criteria = ['cvs_cri_1', 'cvs_cri_2', 'cvs_cri_3']
+
+# bit of every counted field, in the order of the columns of Annotation_Stats.counts
+_field_bits = np.array([flag_bits[f] for f in flag_fields], dtype=np.uint16)
+_seen = flag_fields.index('seen')
+_criteria = [flag_fields.index(c) for c in criteria]
+
+# value of every flag for each of the possible combinations of the flags
+_n_patterns = 1 << len(flag_fields)
+_pattern_values = ((np.arange(_n_patterns)[:, None] >> _field_bits) & 1).astype(np.int64)
+
+
+class Annotation_Stats:
+    """ Per-video counts of the annotations.
+
+    The counts are computed once from the flag column and then updated edit by
+    edit, so that they cost nothing to keep at a million frames:
+        n_frames    frames of each video whose file exists
+        counts      number of frames of each video with each flag_fields set
+        seen_counts the same among the seen frames
+        n_criteria  seen frames of each video meeting 0, 1, 2 and 3 criteria
+    Frames whose file is missing are not counted. """
+
+    def __init__(self, flags, video_idx, video_ids):
+        self.video_ids = list(video_ids)
+        self.video_idx = video_idx
+        n_videos = len(self.video_ids)
+
+        flags = np.asarray(flags)
+        present = ((flags >> status_bits['missing']) & 1) == 0
+        flags = flags[present]
+        videos = np.asarray(video_idx)[present]
+
+        self.n_frames = np.bincount(videos, minlength=n_videos).astype(np.int64)
+
+        # a single pass over the frames counts the combinations of flags of every video,
+        # everything else is derived from these counts
+        patterns = np.bincount(videos.astype(np.int64) * _n_patterns + (flags & (_n_patterns - 1)),
+                               minlength=n_videos * _n_patterns).reshape(n_videos, _n_patterns)
+        seen = _pattern_values[:, _seen] == 1
+        self.counts = patterns @ _pattern_values
+        self.seen_counts = patterns[:, seen] @ _pattern_values[seen]
+
+        n_met = _pattern_values[seen][:, _criteria].sum(axis=1)
+        self.n_criteria = np.stack([patterns[:, seen][:, n_met == k].sum(axis=1) for k in range(4)], axis=1)
+
+    def _add(self, video, flags, sign):
+        if (flags >> status_bits['missing']) & 1:
+            return
+        values = (flags >> _field_bits) & 1
+        self.n_frames[video] += sign
+        self.counts[video] += sign * values.astype(np.int64)
+        if values[_seen]:
+            self.seen_counts[video] += sign * values.astype(np.int64)
+            self.n_criteria[video, int(values[_criteria].sum())] += sign
+
+    def update(self, row, old_flags, new_flags):
+        """ account for the flags of `row` changing from `old_flags` to `new_flags` """
+        if old_flags == new_flags:
+            return
+        video = int(self.video_idx[row])
+        self._add(video, old_flags, -1)
+        self._add(video, new_flags, 1)
+
+    @staticmethod
+    def _summarize(n_frames, counts, seen_counts, n_criteria):
+        n_frames = int(n_frames)
+        n_seen = int(counts[_seen])
+        summary = {
+            'frames': n_frames,
+            'seen': n_seen,
+            'unseen': n_frames - n_seen,
+            'seen_rate': n_seen / n_frames if n_frames else 0.,
+            'counts': {f: int(n) for f, n in zip(flag_fields, counts)},
+            'seen_counts': {f: int(n) for f, n in zip(flag_fields, seen_counts)},
+            # seen frames meeting 0, 1, 2 and 3 criteria
+            'criteria_met': [int(n) for n in n_criteria],
+            }
+        for field_name in criteria + ['out_of_body', 'difficult']:
+            summary[field_name + '_rate'] = summary['seen_counts'][field_name] / n_seen if n_seen else 0.
+        return summary
+
+    def summary(self, per_video=True):
+        """ counts and rates for the dataset and, with `per_video`, for every video. The
+        rates of the criteria, out-of-body and difficult frames are among the seen frames """
+        summary = self._summarize(self.n_frames.sum(), self.counts.sum(axis=0), self.seen_counts.sum(axis=0),
+                                  self.n_criteria.sum(axis=0))
+        if per_video:
+            summary['videos'] = {v: self._summarize(self.n_frames[i], self.counts[i], self.seen_counts[i], self.n_criteria[i])
+                                 for i, v in enumerate(self.video_ids)}
+        return summary
+
+
+def format_summary(summary):
+    """ lines of text of a summary, the flags are counted among the seen frames """
+    n_frames = summary['frames']
+    lines = ['frames            {:>9}'.format(n_frames),
+             'seen              {:>9}  {:6.1%}'.format(summary['seen'], summary['seen_rate']),
+             'unseen            {:>9}'.format(summary['unseen'])]
+    for field_name in criteria + ['out_of_body', 'difficult']:
+        lines.append('{:<18}{:>9}  {:6.1%}'.format(field_name, summary['seen_counts'][field_name],
+                                                   summary[field_name + '_rate']))
+    lines.append('criteria met 0/1/2/3  ' + ' / '.join(str(n) for n in summary['criteria_met']))
+    return lines
+
+
+def load_stats(annotation_path, annotator=None):
+    """ statistics of the annotations saved at `annotation_path`, including the edits
+    still in the journal. Nothing is written """
+    store = open_annotations(annotation_path, annotator)
+    return Annotation_Stats(store.flags, store.video_idx, store.video_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Statistics of the annotations')
+    parser.add_argument('--annotations', default='annotations.pickle', help='annotation path, as in config.json')
+    parser.add_argument('--annotator', default=None, help='annotator name in a shared database')
+    parser.add_argument('--videos', action='store_true', help='also print the statistics of every video')
+    parser.add_argument('--json', default=None, help='write the statistics to this json file')
+    args = parser.parse_args()
+
+    summary = load_stats(args.annotations, args.annotator).summary(per_video=True)
+
+    print('\n'.join(format_summary(summary)))
+    if args.videos:
+        for video_id, video_summary in summary['videos'].items():
+            print('\n' + video_id)
+            print('\n'.join('    ' + line for line in format_summary(video_summary)))
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=1)
+        print('INFO: statistics written to ', args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import json
+import os
+import shutil
+import socket
+
+import numpy as np
+
+# binary annotations, bit i of the flags of a frame holds flag_fields[i]
+flag_fields = ['instr_in_roi', 'difficult', 'out_of_body', 'seen', 'post_view',
+        'cvs_cri_1', 'cvs_cri_2', 'cvs_cri_3', 'anatomical_variation',
+        'roi_not_seen', 'artifact', 'roi_visible_partially']
+
+flag_bits = {f: i for i, f in enumerate(flag_fields)}
+
+# bookkeeping bits that are not annotations, kept above the flags
+status_bits = {'missing': 15}
+
+bits = dict(flag_bits, **status_bits)
+
+# column order used when the store is exported as a table
+columns = ['video_id', 'frame_id', 'frame_id_int'] + flag_fields + ['comment']
+
+STORE_VERSION = 1
+
+# ext_idx of the frames whose file extension has not been recorded yet
+UNKNOWN_EXT = 255
+
+
+def format_frame_ids(frame_id_int, frame_id_width):
+    """ frame file names (without extension) from their integer ids and zero padding """
+    frame_id_int = np.asarray(frame_id_int)
+    frame_id_width = np.asarray(frame_id_width)
+    frame_ids = np.empty(len(frame_id_int), dtype=object)
+    for width in np.unique(frame_id_width):
+        sel = frame_id_width == width
+        frame_ids[sel] = np.char.zfill(frame_id_int[sel].astype(str), int(width))
+    return frame_ids
+
+
+def _write_meta(path, n_frames, video_ids, extensions):
+    meta_path = os.path.join(path, 'meta.json')
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'version': STORE_VERSION, 'n_frames': n_frames, 'video_ids': list(video_ids),
+                   'extensions': list(extensions)}, f)
+    os.replace(meta_path + '.tmp', meta_path)
+
+
+def _pid_running(pid):
+    if os.name == 'nt':
+        # os.kill would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Store_Lock:
+    """ Lock file <store path>.lock telling that a process writes to the store, holding
+    the pid and host of that process. A lock left on this host by a process that is
+    not running anymore (e.g. after a crash) is ignored """
+
+    def __init__(self, store_path):
+        self.path = store_path + '.lock'
+        self.acquired = False
+
+    def owner(self):
+        """ {'pid', 'host'} of the process holding the lock, None if there is none """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                owner = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # lock being written
+            return {'pid': None, 'host': None}
+        if owner.get('host') == socket.gethostname() and not _pid_running(owner.get('pid')):
+            return None
+        return owner
+
+    def acquire(self):
+        owner = self.owner()
+        assert owner is None, 'the annotations are open in another process (pid {} on {}), close it first, ' \
+            'or delete {} if it is not running'.format(owner['pid'], owner['host'], self.path)
+        if os.path.exists(self.path):
+            # stale lock
+            os.remove(self.path)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'host': socket.gethostname()}, f)
+        self.acquired = True
+
+    def release(self):
+        if self.acquired:
+            os.remove(self.path)
+            self.acquired = False
+
+
+class Annotation_Store:
+    """ Columnar, memory-mapped storage of the per-frame annotations.
+
+    A store is a directory holding:
+        meta.json           number of frames, the interned video ids and file extensions
+        flags.npy           uint16 bitfield of the binary annotations per frame,
+                            bit 15 marks frames whose file has disappeared
+        video_idx.npy       int32 index of the video of each frame in meta.json
+        frame_id_int.npy    int32 frame id
+        frame_id_width.npy  uint8 zero padding of the frame file name
+        ext_idx.npy         uint8 index of the file extension of the frame in meta.json,
+                            together with the above it is the manifest of the frame files
+        comments.json       {row: comment} for the frames that have one
+
+    The arrays are memory-mapped, so opening a store does not read them and
+    only the pages that are used end up in memory. Rows are sorted by video
+    and frame id. With `mode` 'r' the store is opened read-only and nothing is
+    written to its folder. """
+
+    def __init__(self, path, mode='r+'):
+        self.mode = mode
+        if mode == 'r+':
+            self.recover(path)
+        elif not os.path.exists(os.path.join(path, 'meta.json')):
+            # read the former store where create() left it, see recover()
+            path = path + '.old'
+        self.path = path
+
+        with open(os.path.join(self.path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        assert meta['version'] == STORE_VERSION, 'unsupported annotation store version {}'.format(meta['version'])
+        self.video_ids = meta['video_ids']
+        self.n_frames = meta['n_frames']
+
+        self.flags = np.load(os.path.join(self.path, 'flags.npy'), mmap_mode=mode)
+        self.video_idx = np.load(os.path.join(self.path, 'video_idx.npy'), mmap_mode='r')
+        self.frame_id_int = np.load(os.path.join(self.path, 'frame_id_int.npy'), mmap_mode='r')
+        self.frame_id_width = np.load(os.path.join(self.path, 'frame_id_width.npy'), mmap_mode='r')
+        assert len(self.flags) == self.n_frames
+
+        # stores written before the manifest existed get one with unknown extensions
+        self.extensions = meta.get('extensions', [])
+        ext_idx_path = os.path.join(self.path, 'ext_idx.npy')
+        if os.path.exists(ext_idx_path):
+            self.ext_idx = np.load(ext_idx_path, mmap_mode=mode)
+        elif mode == 'r':
+            self.ext_idx = np.full(self.n_frames, UNKNOWN_EXT, dtype=np.uint8)
+        else:
+            np.save(ext_idx_path, np.full(self.n_frames, UNKNOWN_EXT, dtype=np.uint8))
+            self.ext_idx = np.load(ext_idx_path, mmap_mode=mode)
+
+        comments_path = os.path.join(self.path, 'comments.json')
+        if os.path.exists(comments_path):
+            with open(comments_path, 'r', encoding='utf-8') as f:
+                self.comments = {int(k): v for k, v in json.load(f).items()}
+        else:
+            self.comments = {}
+
+    @staticmethod
+    def exists(path):
+        """ whether there is a store at `path`, or one to recover (see recover()) """
+        return any(os.path.exists(os.path.join(p, 'meta.json')) for p in (path, path + '.old'))
+
+    @staticmethod
+    def recover(path):
+        """ finish a replacement by create() that was interrupted: the former store
+        comes back if the new one was not renamed in yet, otherwise it is removed """
+        old_path = path + '.old'
+        if not os.path.exists(old_path):
+            return
+        if not os.path.exists(os.path.join(path, 'meta.json')) and os.path.exists(os.path.join(old_path, 'meta.json')):
+            print('WARNING: the annotation store was being rewritten, restoring its former version')
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(old_path, path)
+        else:
+            shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def create(cls, path, video_ids, video_idx, frame_id_int, frame_id_width, flags=None, comments=None,
+               ext_idx=None, extensions=None):
+        """ write a new store. The rows must be sorted by video and frame id """
+        n_frames = len(video_idx)
+        if flags is None:
+            flags = np.zeros(n_frames, dtype=np.uint16)
+        if ext_idx is None:
+            ext_idx = np.full(n_frames, UNKNOWN_EXT, dtype=np.uint8)
+
+        # the store is written next to its final location and renamed at the end
+        tmp_path = path + '.tmp'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        np.save(os.path.join(tmp_path, 'flags.npy'), np.asarray(flags, dtype=np.uint16))
+        np.save(os.path.join(tmp_path, 'video_idx.npy'), np.asarray(video_idx, dtype=np.int32))
+        np.save(os.path.join(tmp_path, 'frame_id_int.npy'), np.asarray(frame_id_int, dtype=np.int32))
+        np.save(os.path.join(tmp_path, 'frame_id_width.npy'), np.asarray(frame_id_width, dtype=np.uint8))
+        np.save(os.path.join(tmp_path, 'ext_idx.npy'), np.asarray(ext_idx, dtype=np.uint8))
+        with open(os.path.join(tmp_path, 'comments.json'), 'w', encoding='utf-8') as f:
+            json.dump({str(k): v for k, v in (comments or {}).items()}, f)
+        _write_meta(tmp_path, n_frames, video_ids, extensions or [])
+
+        # there is always a complete store at `path` or at `path`.old, see recover()
+        cls.recover(path)
+        old_path = path + '.old'
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return cls(path)
+
+    @classmethod
+    def from_dataframe(cls, path, df):
+        """ create a store from a database in the former pandas format """
+        df = df.sort_values(['video_id', 'frame_id_int']).reset_index(drop=True)
+
+        video_ids, video_idx = np.unique(df['video_id'].astype(str).values, return_inverse=True)
+
+        flags = np.zeros(len(df), dtype=np.uint16)
+        for field_name in flag_fields:
+            values = df[field_name].fillna(0).values.astype(bool)
+            flags |= values.astype(np.uint16) << flag_bits[field_name]
+
+        comments = {}
+        for row, comment in zip(range(len(df)), df['comment'].values):
+            if isinstance(comment, str) and comment:
+                comments[row] = comment
+
+        frame_id_width = df['frame_id'].astype(str).str.len().values
+        return cls.create(path, video_ids.tolist(), video_idx, df['frame_id_int'].values,
+                          frame_id_width, flags, comments)
+
+    def __len__(self):
+        return self.n_frames
+
+    def get(self, row, field_name):
+        if field_name in bits:
+            return int((self.flags[row] >> bits[field_name]) & 1)
+        if field_name == 'video_id':
+            return self.video_ids[self.video_idx[row]]
+        if field_name == 'frame_id_int':
+            return int(self.frame_id_int[row])
+        if field_name == 'frame_id':
+            return str(self.frame_id_int[row]).zfill(int(self.frame_id_width[row]))
+        if field_name == 'comment':
+            return self.comments.get(row, '')
+        raise KeyError(field_name)
+
+    def set(self, row, field_name, value):
+        if field_name in bits:
+            bit = np.uint16(1 << bits[field_name])
+            if value:
+                self.flags[row] |= bit
+            else:
+                self.flags[row] &= ~bit
+        elif field_name == 'comment':
+            if value:
+                self.comments[row] = value
+            else:
+                self.comments.pop(row, None)
+        else:
+            raise KeyError('{} can not be modified'.format(field_name))
+
+    def relative_path(self, row):
+        """ path of the frame file relative to the dataset folder, None if its extension is unknown """
+        ext_idx = self.ext_idx[row]
+        if ext_idx == UNKNOWN_EXT:
+            return None
+        return os.path.join(self.get(row, 'video_id'), self.get(row, 'frame_id') + '.' + self.extensions[ext_idx])
+
+    def encode_extensions(self, extensions):
+        """ ext_idx codes of file extensions, new extensions are added to the table """
+        codes = []
+        for ext in extensions:
+            if ext not in self.extensions:
+                assert len(self.extensions) < UNKNOWN_EXT
+                self.extensions.append(ext)
+                _write_meta(self.path, self.n_frames, self.video_ids, self.extensions)
+            codes.append(self.extensions.index(ext))
+        return np.array(codes, dtype=np.uint8)
+
+    def n_unknown_paths(self):
+        """ number of frames still on disk whose file extension is not recorded """
+        return int(np.count_nonzero((np.asarray(self.ext_idx) == UNKNOWN_EXT) & (self.column('missing') == 0)))
+
+    def get_row(self, row):
+        """ all the fields of a frame as a dict """
+        flags = int(self.flags[row])
+        values = {f: (flags >> b) & 1 for f, b in flag_bits.items()}
+        values['video_id'] = self.get(row, 'video_id')
+        values['frame_id'] = self.get(row, 'frame_id')
+        values['frame_id_int'] = self.get(row, 'frame_id_int')
+        values['comment'] = self.get(row, 'comment')
+        return values
+
+    def column(self, field_name, rows=None):
+        """ values of a field for all the frames, or for `rows`, as a numpy array """
+        sel = slice(None) if rows is None else rows
+        if field_name in bits:
+            return ((self.flags[sel] >> bits[field_name]) & 1).astype(np.uint8)
+        if field_name == 'video_id':
+            return np.asarray(self.video_ids, dtype=object)[self.video_idx[sel]]
+        if field_name == 'frame_id_int':
+            return np.asarray(self.frame_id_int[sel])
+        if field_name == 'frame_id':
+            return format_frame_ids(self.frame_id_int[sel], self.frame_id_width[sel])
+        if field_name == 'comment':
+            row_ids = np.arange(self.n_frames)[sel]
+            return np.array([self.comments.get(r, '') for r in row_ids.tolist()], dtype=object)
+        raise KeyError(field_name)
+
+    def to_dataframe(self, rows=None):
+        import pandas as pd
+        return pd.DataFrame({c: self.column(c, rows) for c in columns})
+
+    def flush(self):
+        """ make sure the flags are on disk and save the comments """
+        if self.mode == 'r':
+            return
+        self.flags.flush()
+        self.ext_idx.flush()
+
+        # the comments may be edited from another thread while they are written
+        comments = dict(self.comments)
+        comments_path = os.path.join(self.path, 'comments.json')
+        with open(comments_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({str(k): v for k, v in comments.items()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(comments_path + '.tmp', comments_path)
+
+    def close(self):
+        self.flush()
+        # release the memory maps, the files can not be replaced on Windows while they are mapped
+        del self.flags, self.video_idx, self.frame_id_int, self.frame_id_width, self.ext_idx
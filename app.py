@@ -7,7 +7,12 @@ Website: http://camma.u-strasbg.fr
 Code author: Armine Vardazaryan
 """
 
+import time
+# measured from the start of the process, see Reviewer_Gui_Rater.on_database_ready
+start_time = time.perf_counter()
+
 import json
+import signal
 import tkinter as tk
 import tkinter.font as font
 
@@ -20,13 +25,42 @@ resource_dir = './images'
 config_path = './config.json'
 
 
+def bind_shortcuts(root, app):
+    root.bind('<Left>', app.leftKey)
+    root.bind('<Right>', app.rightKey)
+    root.bind('<Up>', app.upKey)
+    root.bind('<Return>', app.returnKey)
+    root.bind('<KP_Enter>', app.returnKey)
+    root.bind('<F1>', app.oneKey)
+    root.bind('<F2>', app.twoKey)
+    root.bind('<F3>', app.threeKey)
+    
+    root.bind('<Control-a>', app.ctrl_aKey) #artifact
+    root.bind('<Control-n>', app.ctrl_nKey) #roi not visible
+    root.bind('<Control-r>', app.ctrl_rKey) #roi visible partially 
+    root.bind('<Control-i>', app.ctrl_iKey) #instrument in roi
+    root.bind('<Control-d>', app.ctrl_dKey) #difficult to review
+    root.bind('<Control-o>', app.ctrl_oKey) #out of body
+    root.bind('<Control-p>', app.ctrl_pKey) #posterior view
+    root.bind('<Control-v>', app.ctrl_vKey) #anatomical variation
+    
+    root.bind('<Control-k>', app.ctrl_kKey) #context clip
+    root.bind('<F4>', app.statsKey) #statistics
+    root.bind('<F12>', app.timingsKey) #timings overlay
+    
+    root.bind('<Control-z>', app.undoKey)
+    root.bind('<Control-y>', app.redoKey)
+    root.bind('<Control-Z>', app.redoKey) #ctrl+shift+z
+
+
 def main():
     root = tk.Tk()
     
     try:
         with open(config_path, 'r') as f:
             info = json.load(f)
-            datapath = info['datapath']
+            # the frames of a remote server are not read locally
+            datapath = info['datapath'] if 'server' not in info else None
     except:
         
         datapath = filedialog.askdirectory(title='Select folder containing the frames')
@@ -42,26 +76,19 @@ def main():
     default_font.configure(size=11)
     root.option_add("*Font", default_font)
     
-    app = Reviewer_Gui_Rater(datapath, resource_dir, config_path)
-        
-
-    root.bind('<Left>', app.leftKey)
-    root.bind('<Right>', app.rightKey)
-    root.bind('<Up>', app.upKey)
-    root.bind('<Return>', app.returnKey)
-    root.bind('<KP_Enter>', app.returnKey)
-    root.bind('<F1>', app.oneKey)
-    root.bind('<F2>', app.twoKey)
-    root.bind('<F3>', app.threeKey)
+    # the window paints with a loading state, the database is opened in the background
+    app = Reviewer_Gui_Rater(datapath, resource_dir, config_path, start_time=start_time)
+    # the shortcuts need the database
+    app.ready_callbacks.append(lambda: bind_shortcuts(root, app))
     
-    root.bind('<Control-a>', app.ctrl_aKey) #artifact
-    root.bind('<Control-n>', app.ctrl_nKey) #roi not visible
-    root.bind('<Control-r>', app.ctrl_rKey) #roi visible partially 
-    root.bind('<Control-i>', app.ctrl_iKey) #instrument in roi
-    root.bind('<Control-d>', app.ctrl_dKey) #difficult to review
-    root.bind('<Control-o>', app.ctrl_oKey) #out of body
-    root.bind('<Control-p>', app.ctrl_pKey) #posterior view
-    root.bind('<Control-v>', app.ctrl_vKey) #anatomical variation
+    # write the final snapshot of the annotations when the window is closed
+    root.protocol('WM_DELETE_WINDOW', app.on_close)
+    signal.signal(signal.SIGTERM, lambda signum, frame: app.on_close())
+    
+    # python signal handlers only run when the interpreter gets control back from Tk
+    def check_signals():
+        root.after(250, check_signals)
+    root.after(250, check_signals)
 
     root.mainloop()  
     
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+
+Benchmarks of the annotation hot paths on a synthetic dataset.
+
+    python benchmark.py --frames 10000 --videos 20 --ext png --output results.json [--tk]
+
+Times the dataset scan, DB_Manager start-up, navigation with every filter
+combination, goto_frame, the persistence of an edit and the decoding of a
+frame for display. With --tk, the time from a key press to the painted frame
+is measured in the GUI; without a display, Xvfb is started if it is installed.
+The results are written to a json file, durations in milliseconds.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from db_manager import DB_Manager, load_from_dataset
+from frame_loader import load_display_image
+
+resource_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+
+
+def make_dataset(root, n_frames, n_videos, ext='png', size=(854, 480)):
+    """ write a dataset of `n_frames` frames spread over `n_videos` folders. All the
+    frames are the same noisy image, so that they cost as much to decode as real ones """
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+    img = Image.fromarray(pixels).resize(size, resample=Image.BILINEAR)
+    buf = BytesIO()
+    img.save(buf, format='JPEG' if ext == 'jpg' else ext.upper())
+    data = buf.getvalue()
+
+    per_video = int(np.ceil(n_frames / n_videos))
+    for v in range(n_videos):
+        video_path = os.path.join(root, 'video{:03d}'.format(v))
+        os.makedirs(video_path, exist_ok=True)
+        for i in range(min(per_video, n_frames - v * per_video)):
+            with open(os.path.join(video_path, '{:06d}.{}'.format(i * 25, ext)), 'wb') as f:
+                f.write(data)
+
+
+def stats(durations):
+    """ summary of durations in seconds, in milliseconds """
+    ms = np.asarray(durations) * 1000.
+    return {
+        'n': len(ms),
+        'mean': float(ms.mean()),
+        'min': float(ms.min()),
+        'p50': float(np.percentile(ms, 50)),
+        'p95': float(np.percentile(ms, 95)),
+        'max': float(ms.max()),
+        }
+
+
+def timed(fn, repeat=1, setup=None):
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return stats(durations)
+
+
+def bench_db(datapath, workdir, repeat):
+    results = {}
+    annotation_path = os.path.join(workdir, 'annotations.pickle')
+
+    # pandas is imported on first use, its import is a phase of its own rather than part of the first timing
+    results['import_pandas'] = timed(lambda: __import__('pandas'), repeat=1)
+    results['load_from_dataset'] = timed(lambda: load_from_dataset(datapath), repeat=1)
+
+    def clean():
+        shutil.rmtree(workdir)
+        os.makedirs(workdir)
+
+    results['startup_cold'] = timed(lambda: DB_Manager(datapath, annotation_path).close(), repeat=1, setup=clean)
+    results['startup_warm'] = timed(lambda: DB_Manager(datapath, annotation_path).close(), repeat=repeat)
+
+    dbm = DB_Manager(datapath, annotation_path)
+    rng = np.random.default_rng(0)
+
+    # a third of the frames seen, a tenth difficult, so that every filter has something to skip
+    for row in rng.choice(dbm.n_frames, dbm.n_frames // 3, replace=False):
+        dbm.store.set(row, 'seen', 1)
+        dbm.nav_index.update(row, 1, dbm.store.get(row, 'difficult'))
+    for row in rng.choice(dbm.n_frames, dbm.n_frames // 10, replace=False):
+        dbm.store.set(row, 'difficult', 1)
+        dbm.nav_index.update(row, dbm.store.get(row, 'seen'), 1)
+
+    n_steps = min(1000, dbm.n_frames)
+    for shuffle, skip_seen, only_seen, only_difficult in itertools.product([False, True], repeat=4):
+        if skip_seen and only_seen:
+            continue
+        dbm.toggle_shuffle(shuffle)
+        dbm.toggle_skip_seen(skip_seen)
+        dbm.toggle_only_seen(only_seen)
+        dbm.toggle_only_difficult(only_difficult)
+        name = 'next_frame[shuffle={:d},skip_seen={:d},only_seen={:d},only_difficult={:d}]'.format(
+            shuffle, skip_seen, only_seen, only_difficult)
+        results[name] = timed(dbm.next_frame, repeat=n_steps)
+    for toggle in (dbm.toggle_shuffle, dbm.toggle_skip_seen, dbm.toggle_only_seen, dbm.toggle_only_difficult):
+        toggle(False)
+
+    video_ids = dbm.store.column('video_id')
+    frame_ids = dbm.store.column('frame_id')
+    rows = rng.integers(0, dbm.n_frames, 1000)
+    targets = iter([(video_ids[r], frame_ids[r]) for r in rows])
+    results['goto_frame'] = timed(lambda: dbm.goto_frame(*next(targets)), repeat=len(rows))
+
+    paths = [dbm.get_frame_path(r) for r in rows[:100]]
+
+    values = itertools.cycle([0, 1])
+    results['update_value'] = timed(lambda: dbm.update_value('artifact', next(values)), repeat=200)
+    results['update_value_flushed'] = timed(lambda: (dbm.update_value('artifact', next(values)), dbm.flush()), repeat=200)
+    dbm.close()
+
+    sync_dbm = DB_Manager(datapath, annotation_path, save_delay=None, sync=False)
+    results['update_value_synchronous'] = timed(lambda: sync_dbm.update_value('artifact', next(values)), repeat=200)
+    sync_dbm.close()
+
+    for size in [(640, 360), (1280, 720)]:
+        it = iter(paths)
+        results['decode_resize[{}x{}]'.format(*size)] = timed(lambda: load_display_image(next(it), size), repeat=len(paths))
+
+    return results
+
+
+def start_xvfb():
+    """ start a virtual display if there is none. Returns the Xvfb process, or None """
+    if os.environ.get('DISPLAY') or shutil.which('Xvfb') is None:
+        return None
+    display = ':{}'.format(90 + os.getpid() % 100)
+    proc = subprocess.Popen(['Xvfb', display, '-screen', '0', '1920x1080x24'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(1)
+    os.environ['DISPLAY'] = display
+    return proc
+
+
+def bench_tk(datapath, workdir, n_keys=200):
+    """ key press to painted frame in the GUI """
+    import tkinter as tk
+    from rater import Reviewer_Gui_Rater
+
+    config_path = os.path.join(workdir, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump({'datapath': datapath, 'database': os.path.join(workdir, 'annotations_tk.pickle')}, f)
+
+    root = tk.Tk()
+    root.geometry('1280x900')
+    start = time.perf_counter()
+    app = Reviewer_Gui_Rater(datapath, resource_dir, config_path, start_time=start)
+    root.update()
+    results = {'gui_first_paint': stats([time.perf_counter() - start])}
+    # the database is opened in the background, the first frame is shown once it is loaded
+    while app.dbm is None:
+        root.update()
+        time.sleep(0.01)
+    root.update_idletasks()
+    results['gui_startup'] = stats([time.perf_counter() - start])
+
+    def key(fn):
+        fn(None)
+        # the frame is on screen once the pending redraws are done
+        root.update_idletasks()
+
+    results['gui_next_key_to_paint'] = timed(lambda: key(app.rightKey), repeat=n_keys)
+    results['gui_prev_key_to_paint'] = timed(lambda: key(app.leftKey), repeat=n_keys)
+    results['gui_seen_key'] = timed(lambda: key(app.upKey), repeat=n_keys)
+
+    app.on_close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the annotation tool on a synthetic dataset')
+    parser.add_argument('--frames', type=int, default=10000, help='number of frames, 1k to 1M')
+    parser.add_argument('--videos', type=int, default=20)
+    parser.add_argument('--ext', default='png', choices=['png', 'jpg'])
+    parser.add_argument('--datapath', default=None, help='reuse this dataset instead of generating one')
+    parser.add_argument('--repeat', type=int, default=3, help='number of DB_Manager start-ups timed')
+    parser.add_argument('--tk', action='store_true', help='also benchmark the GUI')
+    parser.add_argument('--output', default='benchmark.json', help='json file of the results')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='cvs_benchmark_')
+    try:
+        datapath = args.datapath
+        if datapath is None:
+            datapath = os.path.join(workdir, 'frames')
+            start = time.perf_counter()
+            make_dataset(datapath, args.frames, args.videos, args.ext)
+            print('INFO: dataset generated in {:.1f}s'.format(time.perf_counter() - start))
+
+        dbdir = os.path.join(workdir, 'db')
+        os.makedirs(dbdir)
+        results = bench_db(datapath, dbdir, args.repeat)
+
+        if args.tk:
+            xvfb = start_xvfb()
+            try:
+                if os.environ.get('DISPLAY'):
+                    results.update(bench_tk(datapath, workdir))
+                else:
+                    print('WARNING: no display and no Xvfb, the GUI is not benchmarked')
+            finally:
+                if xvfb is not None:
+                    xvfb.terminate()
+
+        report = {
+            'config': vars(args),
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpus': os.cpu_count(), 'numpy': np.__version__},
+            'time': time.time(),
+            'unit': 'ms',
+            'results': results,
+            }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+        print('INFO: results written to ', args.output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import http.client
+import itertools
+import json
+import threading
+import uuid
+from io import BytesIO
+
+from PIL import Image
+
+# DB_Manager methods that can be called through the server
+remote_methods = {
+    'next_frame', 'prev_frame', 'goto_frame', 'undo', 'redo', 'peek_rows', 'flush', 'get_stats',
+    'set_labels', 'set_comment', 'update_values',
+    'set_instr_flag', 'set_diff_flag', 'set_oob_flag', 'set_seen_flag', 'set_post_view_flag',
+    'set_roi_not_seen_flag', 'set_artifact_flag', 'set_roi_visible_partially_flag',
+    'set_anatomical_variation_flag',
+    'toggle_shuffle', 'toggle_skip_seen', 'toggle_only_seen', 'toggle_only_difficult',
+    'toggle_only_disagreements',
+    }
+
+
+class Remote_DB_Manager:
+    """ DB_Manager interface to an annotation server (see server.py).
+
+    Every call returns the state of the current frame along with its result, so
+    the getters are answered locally without another request. Frame "paths"
+    are server urls and load_display_image() downloads them as display-sized
+    jpegs. Each thread keeps its own keep-alive connection, so the prefetcher
+    downloads the neighbouring frames in parallel. The calls carry the session
+    id of the client and an id, so that a retried call is not applied twice. """
+
+    def __init__(self, host, port, timeout=30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._local = threading.local()
+        self.session_id = uuid.uuid4().hex
+        self._call_ids = itertools.count()
+        self._call_lock = threading.Lock()
+
+        self.state = json.loads(self.request('GET', '/state'))
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def request(self, method, url, body=None):
+        headers = {'X-Session': self.session_id}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        # the server may have closed an idle connection, retry once on a new one. A call
+        # the server did receive is not applied again, the server knows its id
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, url, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                self._local.conn = None
+                if attempt == 1:
+                    raise
+                continue
+            assert response.status == 200, 'server error {}: {}'.format(response.status, data.decode('utf-8', 'replace'))
+            return data
+
+    def call(self, method, *args):
+        with self._call_lock:
+            call_id = next(self._call_ids)
+        reply = json.loads(self.request('POST', '/call', json.dumps({'method': method, 'args': args, 'id': call_id})))
+        self.state = reply['state']
+        return reply['result']
+
+    def __getattr__(self, name):
+        if name in remote_methods:
+            return lambda *args: self.call(name, *args)
+        raise AttributeError(name)
+
+    def get_frame(self):
+        return self.state['frame']
+
+    def get_flags(self):
+        return self.state['frame']
+
+    def get_id(self):
+        return tuple(self.state['id'])
+
+    def get_comment(self):
+        return self.state['frame']['comment']
+
+    def get_progress(self):
+        return tuple(self.state['progress'])
+
+    def get_labels(self):
+        frame = self.state['frame']
+        return [frame['cvs_cri_1'], frame['cvs_cri_2'], frame['cvs_cri_3']]
+
+    def get_row(self):
+        return self.state['row']
+
+    def get_frame_path(self, row=None):
+        if row is None:
+            row = self.state['row']
+        return '/frame/{}'.format(row)
+
+    def peek_frame_paths(self, k):
+        return [self.get_frame_path(row) for row in self.call('peek_rows', k)]
+
+    def load_display_image(self, path, size):
+        """ Frame_Prefetcher loader for the frame urls """
+        data = self.request('GET', '{}?w={}&h={}'.format(path, int(size[0]), int(size[1])))
+        img = Image.open(BytesIO(data))
+        img.load()
+        return img
+
+    def close(self):
+        """ the server keeps the annotations, make sure it has written them. Returns
+        False if it could not """
+        saved = self.call('flush')
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        return saved
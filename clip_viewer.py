@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+from frame_cache import Frame_Cache
+
+
+class Clip_Decoder:
+    """ Decodes the video frames around a given frame with OpenCV in a
+    background thread and keeps them, downscaled, in a byte-budgeted cache.
+
+    Frames are cached one by one, so a window overlapping one that was already
+    viewed only decodes the frames that are not in the cache. """
+
+    def __init__(self, max_size=(480, 270), max_bytes=512 * 2**20):
+        self.max_size = max_size
+        self.cache = Frame_Cache(max_bytes)
+        # one worker: decoding is sequential within a video anyway
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clip-decoder')
+
+    def _resize(self, frame):
+        import cv2
+        height, width = frame.shape[:2]
+        scale = min(self.max_size[0] / width, self.max_size[1] / height, 1.)
+        if scale < 1.:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    def _decode(self, video_path, start, stop):
+        # OpenCV takes a while to import, it is only needed once a clip is played
+        import cv2
+        missing = [i for i in range(start, stop) if (video_path, i) not in self.cache]
+        if len(missing) > 0:
+            cam = cv2.VideoCapture(video_path)
+            try:
+                cam.set(cv2.CAP_PROP_POS_FRAMES, missing[0])
+                for i in range(missing[0], missing[-1] + 1):
+                    ok, frame = cam.read()
+                    if not ok:
+                        break
+                    self.cache.put((video_path, i), self._resize(frame))
+            finally:
+                cam.release()
+
+        frames = []
+        for i in range(start, stop):
+            img = self.cache.get((video_path, i))
+            if img is not None:
+                frames.append((i, img))
+        return frames
+
+    def request(self, video_path, center_frame, fps, seconds=5, frame_count=None):
+        """ future of the list of (frame number, image) within `seconds` around `center_frame` """
+        half = int(round(seconds * fps))
+        start = max(0, center_frame - half)
+        stop = center_frame + half + 1
+        if frame_count:
+            stop = min(stop, frame_count)
+        return self.executor.submit(self._decode, video_path, start, stop)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class Clip_Viewer(tk.Toplevel):
+    """ Window playing a decoded clip in a loop, with a slider to scrub through it """
+
+    def __init__(self, master, future, fps, center_frame, title):
+        super().__init__(master)
+        self.title(title)
+
+        self.future = future
+        self.delay = max(1, int(1000 / fps)) if fps > 0 else 40
+        self.center_frame = center_frame
+        self.frames = []
+        self.playing = True
+        self.position = 0
+        # pending call of play() or wait_for_frames(), a single one at a time
+        self._after_id = None
+
+        self.img_label = ttk.Label(self, text='Loading...', anchor='center')
+        self.img_label.grid(row=0, column=0, columnspan=3, sticky=tk.N+tk.E+tk.W+tk.S)
+
+        self.play_button = ttk.Button(self, text='Pause', command=self.play_callback, width=8)
+        self.play_button.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
+
+        self.scale = ttk.Scale(self, from_=0, to=0, orient=tk.HORIZONTAL, command=self.scale_callback)
+        self.scale.grid(row=1, column=1, sticky=tk.E+tk.W, padx=5)
+
+        self.info_line = tk.StringVar()
+        info_lbl = ttk.Label(self, textvariable=self.info_line, width=22)
+        info_lbl.grid(row=1, column=2, sticky=tk.E, padx=5)
+
+        self.columnconfigure(1, weight=1)
+        self.bind('<space>', lambda event: self.play_callback())
+
+        self._after_id = self.after(20, self.wait_for_frames)
+
+    def destroy(self):
+        self.cancel_pending()
+        super().destroy()
+
+    def cancel_pending(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+
+    def wait_for_frames(self):
+        self._after_id = None
+        if not self.future.done():
+            self._after_id = self.after(50, self.wait_for_frames)
+            return
+        try:
+            self.frames = self.future.result()
+        except Exception as e:
+            self.img_label.configure(text='Could not decode the video: {}'.format(e))
+            return
+        if len(self.frames) == 0:
+            self.img_label.configure(text='No frames decoded')
+            return
+
+        self.scale.configure(to=len(self.frames) - 1)
+        self.play()
+
+    def show(self, position):
+        self.position = position
+        frame_no, image = self.frames[position]
+        img = ImageTk.PhotoImage(image)
+        self.img_label.configure(image=img, text='')
+        self.img_label.image = img
+
+        marker = '  (current)' if frame_no == self.center_frame else ''
+        self.info_line.set('frame {}{}'.format(frame_no, marker))
+
+    def play(self):
+        self._after_id = None
+        if not self.playing or not self.winfo_exists():
+            return
+        self.show(self.position)
+        self.scale.set(self.position)
+        self.position = (self.position + 1) % len(self.frames)
+        self._after_id = self.after(self.delay, self.play)
+
+    def play_callback(self):
+        self.playing = not self.playing
+        self.play_button.configure(text='Pause' if self.playing else 'Play')
+        if len(self.frames) > 0:
+            # a call left from before the pause would start a second loop
+            self.cancel_pending()
+            if self.playing:
+                self.play()
+
+    def scale_callback(self, value):
+        if self.playing or len(self.frames) == 0:
+            return
+        self.show(int(float(value)))
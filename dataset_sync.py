@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import json
+import os
+
+import numpy as np
+
+from annotation_store import Annotation_Store, bits
+from scanner import scan_dataset
+
+manifest_name = 'scan_manifest.json'
+
+MISSING_BIT = np.uint16(1 << bits['missing'])
+
+
+def stat_video_dirs(datapath):
+    """ {video folder: [mtime_ns, inode]}. Adding, removing or renaming a frame
+    changes the mtime of its folder """
+    dirs = {}
+    with os.scandir(datapath) as it:
+        for entry in it:
+            if entry.is_dir() and not entry.name.startswith('.'):
+                st = entry.stat()
+                dirs[entry.name] = [st.st_mtime_ns, st.st_ino]
+    return dirs
+
+
+def load_manifest(store_path):
+    path = os.path.join(store_path, manifest_name)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(store_path, dirs):
+    path = os.path.join(store_path, manifest_name)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(dirs, f)
+    os.replace(path + '.tmp', path)
+
+
+def sync_store(store, datapath, progress=None):
+    """ bring the store up to date with the frames on disk.
+
+    Only the video folders whose mtime or inode differ from the manifest saved
+    with the store are scanned. Frames found on disk but not in the store are
+    added with empty annotations, frames of the store that are no longer on
+    disk get the `missing` bit (and lose it if they come back). Returns the
+    store, which is a new object if rows were added, and the number of added
+    and missing frames. """
+    dirs = stat_video_dirs(datapath)
+    manifest = load_manifest(store.path)
+    if store.n_unknown_paths() > 0:
+        # the store has no file manifest yet, every folder has to be listed once
+        manifest = {}
+
+    changed = [v for v in dirs if manifest.get(v) != dirs[v]]
+    removed = [v for v in store.video_ids if v not in dirs]
+
+    scan = scan_dataset(datapath, video_dirs=changed, progress=progress) if changed else None
+
+    video_codes = {v: i for i, v in enumerate(store.video_ids)}
+    video_idx = np.asarray(store.video_idx)
+    frame_id_int = np.asarray(store.frame_id_int)
+
+    def video_rows(video_id):
+        code = video_codes[video_id]
+        return np.searchsorted(video_idx, code, side='left'), np.searchsorted(video_idx, code, side='right')
+
+    n_missing_before = int(np.count_nonzero(np.asarray(store.flags) & MISSING_BIT))
+
+    # frames of the removed folders are all missing
+    for video_id in removed:
+        start, stop = video_rows(video_id)
+        store.flags[start:stop] |= MISSING_BIT
+
+    if scan is not None:
+        # extension codes of the scan translated to the ones of the store
+        ext_codes = store.encode_extensions(scan.extensions)
+
+    added = []
+    for i, video_id in enumerate(scan.video_ids if scan is not None else []):
+        sel = scan.video_idx == i
+        found = scan.frame_id_int[sel]
+        found_ext = ext_codes[scan.ext_idx[sel]] if len(scan.extensions) > 0 else np.zeros(0, dtype=np.uint8)
+
+        if video_id in video_codes:
+            start, stop = video_rows(video_id)
+            present = np.isin(frame_id_int[start:stop], found)
+            flags = np.asarray(store.flags[start:stop])
+            store.flags[start:stop] = np.where(present, flags & ~MISSING_BIT, flags | MISSING_BIT)
+
+            # the extension of a frame may have changed (e.g. png converted to jpg)
+            present_rows = start + np.flatnonzero(present)
+            store.ext_idx[present_rows] = found_ext[np.searchsorted(found, frame_id_int[present_rows])]
+
+            new = ~np.isin(found, frame_id_int[start:stop])
+        else:
+            new = np.ones(len(found), dtype=bool)
+
+        if np.any(new):
+            added.append((video_id, found[new], scan.frame_id_width[sel][new], found_ext[new]))
+
+    n_added = sum(len(a[1]) for a in added)
+    if n_added > 0:
+        store = _merge_rows(store, added)
+
+    n_missing = int(np.count_nonzero(np.asarray(store.flags) & MISSING_BIT))
+    if n_added > 0 or n_missing != n_missing_before:
+        print('INFO: dataset sync, {} frames added, {} frames missing'.format(n_added, n_missing))
+
+    store.flush()
+    save_manifest(store.path, dirs)
+    return store, n_added, n_missing
+
+
+def _merge_rows(store, added):
+    """ rewrite the store with the new frames inserted at their sorted position """
+    video_ids = sorted(set(store.video_ids) | set(a[0] for a in added))
+    codes = {v: i for i, v in enumerate(video_ids)}
+    remap = np.array([codes[v] for v in store.video_ids], dtype=np.int32)
+
+    video_idx = [remap[np.asarray(store.video_idx)]] + [np.full(len(a[1]), codes[a[0]], dtype=np.int32) for a in added]
+    frame_id_int = [np.asarray(store.frame_id_int)] + [a[1] for a in added]
+    frame_id_width = [np.asarray(store.frame_id_width)] + [a[2] for a in added]
+    flags = [np.array(store.flags)] + [np.zeros(len(a[1]), dtype=np.uint16) for a in added]
+    ext_idx = [np.asarray(store.ext_idx)] + [a[3] for a in added]
+
+    video_idx = np.concatenate(video_idx)
+    frame_id_int = np.concatenate(frame_id_int)
+    order = np.lexsort((frame_id_int, video_idx))
+
+    # new row of every old row, to move the comments along
+    new_rows = np.empty(len(order), dtype=np.int64)
+    new_rows[order] = np.arange(len(order))
+    comments = {int(new_rows[r]): c for r, c in store.comments.items()}
+
+    path = store.path
+    extensions = list(store.extensions)
+    frame_id_width = np.concatenate(frame_id_width)[order]
+    flags = np.concatenate(flags)[order]
+    ext_idx = np.concatenate(ext_idx)[order]
+    store.close()
+    return Annotation_Store.create(path, video_ids, video_idx[order], frame_id_int[order],
+                                   frame_id_width, flags, comments, ext_idx, extensions)
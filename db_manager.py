@@ -7,11 +7,23 @@ Website: http://camma.u-strasbg.fr
 Code author: Armine Vardazaryan
 """
 
-import pandas as pd
 import numpy as np
 import os
-import pickle
-from glob import glob1
+import getpass
+import copy
+from collections import deque
+
+from journal import Change_Journal
+from history import History_Store
+from nav_index import Navigation_Index
+from frame_index import Frame_Index
+from annotation_store import Annotation_Store, Store_Lock, columns, flag_fields, format_frame_ids
+from scanner import scan_dataset, print_progress
+from dataset_sync import sync_store, stat_video_dirs, save_manifest
+from saver import Background_Saver
+from annotation_stats import Annotation_Stats
+from instrumentation import timed
+from sqlite_store import Sqlite_Store, Sqlite_Journal, Sqlite_History, sqlite_extensions
 
 header = {
         'video_id', 
@@ -33,247 +45,378 @@ header = {
         }
 
 def load_from_dataset(p):
-    d = []
-    for root, dirs, files in os.walk(p):
-        if root==p:
-            continue
-        vidname = os.path.basename(root)
-
-        for framename in files:
-            if not framename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                continue
-            frame_id, fileformat = framename.split('.')
-            frame_id_int = int(frame_id)
-            
-            d.append([vidname, frame_id, frame_id_int]) 
-    
-    d = np.vstack(d) 
-    
-    df = pd.DataFrame(columns=header)
-    
-    df['video_id'] = d[:,0]
-    df['video_id'] = df['video_id'].astype(str)
-    
-    df['frame_id'] = d[:,1]
-    df['frame_id'] = df['frame_id'].astype(str)
-    
-    df['frame_id_int'] = d[:,2]
-    df['frame_id_int'] = df['frame_id_int'].astype(int)
-    
-    cols = ['video_id', 'frame_id', 'frame_id_int', 'comment']
-    for c in cols:
-        df[c].fillna("", inplace=True)
-    
+    """ database of the frames found in `p` as a pandas DataFrame, and the file
+    extension of the first frame """
+    import pandas as pd
+    scan = scan_dataset(p, progress=print_progress)
     
-    cols = ['instr_in_roi', 'difficult', 'out_of_body', 'seen', 'post_view', 
-            'cvs_cri_1', 'cvs_cri_2', 'cvs_cri_3', 'anatomical_variation',
-            'roi_not_seen', 'artifact','roi_visible_partially']
-    for c in cols:
-        df[c].fillna(0, inplace=True)
+    df = pd.DataFrame({
+        'video_id': np.asarray(scan.video_ids, dtype=object)[scan.video_idx],
+        'frame_id': format_frame_ids(scan.frame_id_int, scan.frame_id_width),
+        'frame_id_int': scan.frame_id_int.astype(int),
+        }, columns=columns)
     
-    df = df.sort_values(['video_id','frame_id_int'])
-    df = df.reset_index(drop=True)
+    df['comment'] = ""
+    for c in flag_fields:
+        df[c] = 0
     
+    fileformat = scan.extensions[scan.ext_idx[0]] if len(scan) > 0 else None
     return df, fileformat
 
-def find_file_extension(p):
-    """ takes a path with a partial file name. Returns full path of file """
-    dirpath = os.path.dirname(p)
-    filename = os.path.basename(p)
-    
-    files = glob1(dirpath, '*.png')
-    files.extend(glob1(dirpath, '*.jpg'))
-    files.extend(glob1(dirpath, '*.jpeg'))
-    
-    found_filename = [f for f in files if filename in f]
-    assert(len(found_filename) > 0)
-    
-    extension = found_filename[0].split('.')[1]
-    return extension
-
 class DB_Manager:
 
-    def __init__(self, frames_path, annotation_path):
+    # navigation and undo state of one annotator, the rest is shared by the sessions of a server
+    session_fields = ('_current_frame_idx', 'shuffled', 'skip_seen', 'only_seen', 'only_difficult', 'only_disagreements',
+                      'undo_stack', 'redo_stack')
+
+    def __init__(self, frames_path, annotation_path, compact_every=500, max_undo=1000, sync=True, save_delay=0.5,
+                 annotator=None):
         self.frames_path = frames_path
         
         self.annotation_path = annotation_path
+        self.export_path = self.annotation_path
+        
+        # edits are appended to the journal, the full snapshot is only rewritten
+        # every `compact_every` edits and when the manager is closed
+        self.compact_every = compact_every
+        
+        # a .sqlite annotation path is a database shared by several annotators
+        self.sqlite = os.path.splitext(self.annotation_path)[1] in sqlite_extensions
+        if self.sqlite:
+            self.annotator = annotator or getpass.getuser()
+            self.store = Sqlite_Store(self.annotation_path, self.annotator)
+            self.journal = Sqlite_Journal(self.store)
+            # every annotator exports their own snapshot
+            self.export_path = '{}_{}.pickle'.format(os.path.splitext(self.annotation_path)[0], self.annotator)
+            if sync or len(self.store) == 0:
+                self.store.sync(self.frames_path, progress=print_progress)
+        else:
+            # tools writing to the store, such as merge.py --into, refuse to run while the lock is held
+            self.lock = Store_Lock(os.path.splitext(self.annotation_path)[0])
+            self.lock.acquire()
+            self.journal = Change_Journal(os.path.splitext(self.annotation_path)[0] + '.journal')
+            self.open_store(sync)
         
-        try:
-            self.database = pd.read_pickle(self.annotation_path)
-            
-            self.fileformat = find_file_extension(os.path.join(self.frames_path, self.database.iloc[0]['video_id'], self.database.iloc[0]['frame_id']))
-            
-        except (OSError, IOError) as e:
-            self.database, self.fileformat = load_from_dataset(self.frames_path)
-            self.save_database()
-            
-        assert(len(self.database) > 0)
-        
+        assert(len(self.store) > 0)
         
         self._current_frame_idx = 0
-        self.n_frames = len(self.database)
+        self.n_frames = len(self.store)
 
         self.shuffled_indices = np.arange(self.n_frames)
         np.random.seed(42)
         np.random.shuffle(self.shuffled_indices)
         
+        # inverse permutation: position of every row in the shuffled order
+        self.shuffled_positions = np.empty(self.n_frames, dtype=np.int64)
+        self.shuffled_positions[self.shuffled_indices] = np.arange(self.n_frames)
+        
+        self.frame_index = Frame_Index(self.store.column('video_id'), self.store.column('frame_id_int'))
+        
+        self.nav_index = Navigation_Index(self.store.column('seen'), self.store.column('difficult'), self.shuffled_indices, self.shuffled_positions,
+                                          eligible=self.store.column('missing') == 0)
+        
+        # rows on which annotators disagree and their own index, see load_disagreements
+        self.disagreements = None
+        self.disagreement_index = None
+        self.only_disagreements = False
+        
+        # progress of the annotation, updated by every edit
+        self.stats = Annotation_Stats(self.store.flags, self.store.video_idx, self.store.video_ids)
+        
         self.shuffled = False
         self.skip_seen = False
         self.only_seen = False
         self.only_difficult = False
         
-        #load history
-        self.history_path = os.path.join(os.path.dirname(os.path.abspath(self.annotation_path)), 'history.pickle')
-        if os.path.exists(self.history_path):
-            with open(self.history_path, 'rb') as handle:
-                self.history = pickle.load(handle)
+        #history of the edits, one delta per edit in rotating segment files
+        if self.sqlite:
+            self.history = Sqlite_History(self.store)
         else:
-            self.history = []
+            self.history_path = os.path.join(os.path.dirname(os.path.abspath(self.annotation_path)), 'history')
+            self.history = History_Store(self.history_path)
         
+        # edits are written by a background thread at most `save_delay` seconds after they
+        # are made, or synchronously if save_delay is None
+        self.saver = None
+        if save_delay is not None:
+            self.saver = Background_Saver(self.journal, self.history, on_written=self.maybe_compact, delay=save_delay)
         
-    def save_history(self, before_frame, after_frame):
+        # undo/redo only keep the edits of the current session
+        self.undo_stack = deque(maxlen=max_undo)
+        self.redo_stack = []
         
-        if np.all(before_frame == after_frame):
+        # moving to the first frame flushes the saver, it must exist
+        if self.store.get(0, 'missing'):
+            self.next_frame()
+        
+        self._initial_session = {f: copy.copy(v) for f, v in self.get_session().items()}
+        
+    def get_session(self):
+        return {f: getattr(self, f) for f in self.session_fields}
+    
+    def set_session(self, session):
+        for field_name, value in session.items():
+            setattr(self, field_name, value)
+    
+    def new_session(self):
+        """ session of another annotator: the first frame, no filter and nothing to undo """
+        return {f: copy.copy(v) for f, v in self._initial_session.items()}
+        
+    def open_store(self, sync):
+        """ open the memory-mapped store next to the annotation path, creating it if needed """
+        # the annotations live in a memory-mapped store, the pickle and csv are exported snapshots
+        self.store_path = os.path.splitext(self.annotation_path)[0]
+        if Annotation_Store.exists(self.store_path):
+            self.store = Annotation_Store(self.store_path)
+        elif os.path.exists(self.annotation_path):
+            print('INFO: converting {} to an annotation store'.format(self.annotation_path))
+            import pandas as pd
+            self.store = Annotation_Store.from_dataframe(self.store_path, pd.read_pickle(self.annotation_path))
+        else:
+            # folders are stat'ed before the scan, a frame added meanwhile is picked up by the next sync
+            video_dirs = stat_video_dirs(self.frames_path)
+            scan = scan_dataset(self.frames_path, progress=print_progress)
+            assert len(scan) > 0, 'no frames found in {}'.format(self.frames_path)
+            self.store = Annotation_Store.create(self.store_path, scan.video_ids, scan.video_idx, scan.frame_id_int, scan.frame_id_width,
+                                                 ext_idx=scan.ext_idx, extensions=scan.extensions)
+            save_manifest(self.store_path, video_dirs)
+            # a journal left without its snapshot belongs to discarded annotations
+            self.journal.truncate()
+            
+        self.replay_journal()
+        
+        # rows may move when frames are added, so the journal has to be empty at this point.
+        # Stores without a file manifest are always synced once to build it
+        if sync or self.store.n_unknown_paths() > 0:
+            self.store, _, _ = sync_store(self.store, self.frames_path, progress=print_progress)
+        
+    @timed('db.save_edit')
+    def save_edit(self, row, changes, op='edit'):
+        """ persist an edit already applied to the store: history delta and journal record """
+        delta = self.history.make_delta(row, self.store.get(row, 'video_id'), self.store.get(row, 'frame_id_int'), changes, op)
+        values = {k: v[1] for k, v in changes.items()}
+        
+        if self.saver is not None:
+            self.saver.submit(row, values, delta)
             return
         
-        self.history.append((list(before_frame), list(after_frame)))
+        self.history.write([delta])
+        self.journal.append(row, values)
+        self.maybe_compact()
         
-        with open(self.history_path, 'wb') as handle:
-            pickle.dump(self.history, handle)
+    def maybe_compact(self):
+        if self.journal.n_records >= self.compact_every:
+            self.compact()
+        
+    def flush(self):
+        """ block until every edit made so far is on disk, for a bounded time. Returns
+        False if some edits could not be written """
+        if self.saver is not None:
+            return self.saver.flush()
+        return True
     
+    @timed('db.save_database')
     def save_database(self):
-        self.database.to_pickle(self.annotation_path)#, index=False)
-        self.database.to_csv(self.annotation_path.split('.')[0]+'.csv')
+        """ export the annotations as a pickle (former database format), see export.py for other formats """
+        database = self.store.to_dataframe()
+        # write to a temporary file first so that a crash never leaves a truncated snapshot
+        tmp_path = self.export_path + '.tmp'
+        database.to_pickle(tmp_path)#, index=False)
+        os.replace(tmp_path, self.export_path)
+        
+    def replay_journal(self):
+        """ apply the edits made after the last snapshot """
+        for row, values in self.journal.replay():
+            for field_name, value in values.items():
+                self.store.set(row, field_name, value)
+        
+        if self.journal.n_records > 0 or self.journal.torn:
+            print('INFO: replayed {} journal records'.format(self.journal.n_records))
+            # the snapshot now holds the replayed edits, the torn record goes with the journal
+            self.compact()
+    
+    def flush_async(self):
+        """ write the pending edits now, e.g. when leaving a frame, without waiting """
+        if self.saver is not None:
+            self.saver.request_flush()
+        
+    def compact(self):
+        """ write the store to disk and start a new journal """
+        self.store.flush()
+        self.journal.truncate()
+        
+    def close(self):
+        """ write the annotations and release them. Returns False if they could not
+        all be written, the error is printed """
+        if self.saver is not None:
+            if not self.saver.close():
+                print('ERROR: the journal misses some edits, writing the snapshot ', self.saver.error)
+            self.saver = None
+        try:
+            # the snapshot holds the edits the saver could not write
+            self.compact()
+            self.save_database()
+            self.journal.close()
+            self.history.close()
+            self.store.close()
+        except Exception as e:
+            print('ERROR: could not save the annotations ', e)
+            return False
+        finally:
+            if not self.sqlite:
+                self.lock.release()
+        return True
         
     def get_frame(self):
-        if self.shuffled:
-            idx = self.shuffled_indices[self._current_frame_idx]
-        else:
-            idx = self._current_frame_idx
-        return self.database.iloc[idx]
+        return self.store.get_row(self.get_row())
     
     def get_id(self):
-        if self.shuffled:
-            idx = self.shuffled_indices[self._current_frame_idx]
-        else:
-            idx = self._current_frame_idx
-            
-        return (self.database.iloc[idx]['video_id'], self.database.iloc[idx]['frame_id_int'])
+        row = self.get_row()
+        return (self.store.get(row, 'video_id'), self.store.get(row, 'frame_id_int'))
     
     def get_comment(self):
-        if self.shuffled:
-            idx = self.shuffled_indices[self._current_frame_idx]
-        else:
-            idx = self._current_frame_idx
-            
-        comment = self.database.iloc[idx]['comment']
-        if not comment:
-            return ''
-        return comment
+        return self.store.get(self.get_row(), 'comment')
     
     def get_progress(self):
         return ((self._current_frame_idx + 1), self.n_frames)
     
-    def get_frame_path(self):
-        if self.shuffled:
-            idx = self.shuffled_indices[self._current_frame_idx]
-        else:
-            idx = self._current_frame_idx
-        vid_dir = self.database.iloc[idx]['video_id']
-        
-        file_name = self.database.iloc[idx]['frame_id'] +'.'+self.fileformat
-        return os.path.join(self.frames_path, vid_dir, file_name)
-        
-        
+    def get_stats(self, per_video=True):
+        """ annotation progress, see Annotation_Stats.summary """
+        return self.stats.summary(per_video)
+    
+    def get_frame_path(self, row=None):
+        if row is None:
+            row = self.get_row()
+        return os.path.join(self.frames_path, self.store.relative_path(row))
+        
+    def find_position(self, position, step):
+        """ next position in the direction of `step` (+1/-1) whose frame passes
+        the active filters. Returns `position` if there is none """
+        nav_index = self.disagreement_index if self.only_disagreements else self.nav_index
+        if not (self.skip_seen or self.only_seen or self.only_difficult) and nav_index.n_excluded == 0:
+            return (position + step) % self.n_frames
+        
+        classes = nav_index.allowed_classes(self.skip_seen, self.only_seen, self.only_difficult)
+        return nav_index.find(position, step, self.shuffled, classes)
+    
+    @timed('db.next_frame')
     def next_frame(self):
-        counter = 0
-        while True:
-            self._current_frame_idx += 1
-            self._current_frame_idx %= self.n_frames
-            
-            if self.shuffled:
-                idx = self.shuffled_indices[self._current_frame_idx]
-            else:
-                idx = self._current_frame_idx
-                    
-            seen = self.database.loc[idx, 'seen']
-            difficult = self.database.loc[idx, 'difficult']
-            
-            if not (self.skip_seen and seen) \
-                and not (self.only_difficult and not difficult) \
-                and not (self.only_seen and not seen):
-                break
-            
-            counter += 1
-            if counter >= self.n_frames:
-                break
-            
-        return self.database.iloc[idx]
+        self.flush_async()
+        self._current_frame_idx = self.find_position(self._current_frame_idx, 1)
+        return self.get_frame()
             
+    @timed('db.prev_frame')
     def prev_frame(self):
-        counter = 0
-        while True:            
-            self._current_frame_idx -= 1
-            self._current_frame_idx %= self.n_frames
-            
-            if self.shuffled:
-                idx = self.shuffled_indices[self._current_frame_idx]
-            else:
-                idx = self._current_frame_idx
-                    
-            seen = self.database.loc[idx, 'seen']
-            difficult = self.database.loc[idx, 'difficult']
-            
-            if not (self.skip_seen and seen) \
-                and not (self.only_difficult and not difficult) \
-                and not (self.only_seen and not seen):
-                break
-            
-            counter += 1
-            if counter >= self.n_frames:
-                break
-            
-        return self.database.iloc[idx]
+        self.flush_async()
+        self._current_frame_idx = self.find_position(self._current_frame_idx, -1)
+        return self.get_frame()
+    
+    def peek_frame_paths(self, k):
+        """ paths of the next and previous k frames in the current navigation
+        order, nearest first. The current frame is not changed """
+        return [self.get_frame_path(row) for row in self.peek_rows(k)]
+    
+    def peek_rows(self, k):
+        """ rows of the frames returned by peek_frame_paths """
+        rows = []
+        forward = backward = self._current_frame_idx
+        for i in range(k):
+            forward = self.find_position(forward, 1)
+            backward = self.find_position(backward, -1)
+            for position in (forward, backward):
+                row = self.shuffled_indices[position] if self.shuffled else position
+                if row not in rows:
+                    rows.append(int(row))
+        
+        return rows
     
     def get_labels(self):
-        if self.shuffled:
-            idx = self.shuffled_indices[self._current_frame_idx]
-        else:
-            idx = self._current_frame_idx
-            
-        c1 = self.database.iloc[idx]['cvs_cri_1']
-        c2 = self.database.iloc[idx]['cvs_cri_2']
-        c3 = self.database.iloc[idx]['cvs_cri_3']
-        
-        return [c1, c2, c3]
+        row = self.get_row()
+        return [self.store.get(row, 'cvs_cri_1'), self.store.get(row, 'cvs_cri_2'), self.store.get(row, 'cvs_cri_3')]
     
     def get_flags(self):
 
         return self.get_frame()
     
+    def get_row(self):
+        if self.shuffled:
+            return self.shuffled_indices[self._current_frame_idx]
+        return self._current_frame_idx
+    
+    def apply_values(self, row, values, op='edit'):
+        """ set fields of a row, record the delta and journal it. Returns the changes """
+        row = int(row)
+        old_flags = int(self.store.flags[row])
+        changes = {}
+        for field_name, new_value in values.items():
+            old_value = self.store.get(row, field_name)
+            if old_value == new_value:
+                continue
+            changes[field_name] = (old_value, new_value)
+            self.store.set(row, field_name, new_value)
+            
+        if len(changes) == 0:
+            return changes
+        
+        if 'seen' in changes or 'difficult' in changes:
+            self.nav_index.update(row, self.store.get(row, 'seen'), self.store.get(row, 'difficult'))
+            if self.disagreement_index is not None:
+                self.disagreement_index.update(row, self.store.get(row, 'seen'), self.store.get(row, 'difficult'))
+        self.stats.update(row, old_flags, int(self.store.flags[row]))
+        
+        self.save_edit(row, changes, op)
+        
+        return changes
+    
+    @timed('db.update_values')
+    def update_values(self, values):
+        """ set several fields of the current frame at once: one history delta,
+        one journal record and one undo step. Returns the changes """
+        row = self.get_row()
+        
+        changes = self.apply_values(row, values)
+        
+        if len(changes) > 0:
+            self.undo_stack.append((int(row), changes))
+            self.redo_stack.clear()
+        return changes
+    
     def update_value(self, field_name, new_value):
-        old_frame_data = self.get_frame().copy()
+        return self.update_values({field_name: new_value})
         
-        if self.shuffled:
-            idx = self.shuffled_indices[self._current_frame_idx]
-        else:
-            idx = self._current_frame_idx
-
-        self.database.loc[idx, field_name] = new_value
+    def undo(self):
+        """ revert the last edit and move to its frame. Returns False if there is nothing to undo """
+        if len(self.undo_stack) == 0:
+            return False
+        
+        row, changes = self.undo_stack.pop()
+        self.apply_values(row, {k: v[0] for k, v in changes.items()}, op='undo')
+        self.redo_stack.append((row, changes))
         
-        new_frame_data = self.get_frame().copy()
+        self.goto_row(row)
+        return True
+    
+    def redo(self):
+        """ re-apply the last undone edit and move to its frame """
+        if len(self.redo_stack) == 0:
+            return False
         
-        self.save_history(old_frame_data, new_frame_data)
+        row, changes = self.redo_stack.pop()
+        self.apply_values(row, {k: v[1] for k, v in changes.items()}, op='redo')
+        self.undo_stack.append((row, changes))
         
-        self.save_database()
+        self.goto_row(row)
+        return True
         
-    def set_labels(self, new_labels):
+    def set_labels(self, new_labels, seen=None):
+        """ set the three criteria, and the seen flag if given, as a single edit """
         if len(new_labels) != 3:
             return
         
-        self.update_value('cvs_cri_1', new_labels[0])
-        self.update_value('cvs_cri_2', new_labels[1])
-        self.update_value('cvs_cri_3', new_labels[2])
+        values = {'cvs_cri_1': new_labels[0], 'cvs_cri_2': new_labels[1], 'cvs_cri_3': new_labels[2]}
+        if seen is not None:
+            values['seen'] = seen
+        self.update_values(values)
         
     def set_instr_flag(self, new_state):
         self.update_value('instr_in_roi', new_state)
@@ -308,26 +451,38 @@ class DB_Manager:
         
         self.update_value('comment', comment)
     
-    def goto_frame(self, vid_id, frame_id):
-        
+    @timed('db.goto_frame')
+    def goto_frame(self, vid_id, frame_id, nearest=True):
+        """ go to a frame of a video. If the frame is not in the database and
+        `nearest` is set, go to the first frame of the video after it """
         try:
             frame_id_int = int(frame_id)
         except:
             print('ERROR: frame id should only contain numbers ',frame_id)
             return 
         
+        row = self.frame_index.find(vid_id, frame_id_int)
+        
+        if row is None and nearest:
+            row = self.frame_index.find_at_or_after(vid_id, frame_id_int)
+            if row is not None:
+                print('INFO: frame {} not found, going to frame {}'.format(frame_id_int, self.store.get(row, 'frame_id_int')))
         
-        found_idx = np.where((self.database['frame_id_int']==frame_id_int) & (self.database['video_id']==vid_id))[0]
+        if row is None:
+            return
         
-        if len(found_idx) == 0:
+        if self.store.get(row, 'missing'):
+            print('ERROR: the file of this frame is missing ', self.get_frame_path(row))
             return
         
-        found_idx = found_idx[0]
+        self.goto_row(row)
         
+    def goto_row(self, row):
+        self.flush_async()
         if self.shuffled:
-            self._current_frame_idx = np.where(self.shuffled_indices==found_idx)[0][0]
+            self._current_frame_idx = self.shuffled_positions[row]
         else:
-            self._current_frame_idx = found_idx
+            self._current_frame_idx = row
 
     def toggle_shuffle(self, shuffle=False):
         self.shuffled = shuffle
@@ -340,4 +495,31 @@ class DB_Manager:
         
     def toggle_only_difficult(self, only_difficult=False):
         self.only_difficult = only_difficult
+        
+    def toggle_only_disagreements(self, only_disagreements=False):
+        """ returns whether the mode is on, it needs the disagreements to be loaded """
+        self.only_disagreements = only_disagreements and self.disagreement_index is not None
+        return self.only_disagreements
+    
+    def load_disagreements(self, path):
+        """ read the frames on which annotators disagree, written by agreement.py, for
+        the "only disagreements" mode. Returns the number of frames found in the database """
+        import pandas as pd
+        
+        if not os.path.exists(path):
+            print('WARNING: no disagreements file at ', path)
+            return 0
+        df = pd.read_csv(path, usecols=['video_id', 'frame_id_int'], dtype={'video_id': str})
+        rows = [self.frame_index.find(v, f) for v, f in zip(df['video_id'].tolist(), df['frame_id_int'].tolist())]
+        found = [r for r in rows if r is not None]
+        if len(found) < len(rows):
+            print('WARNING: {} frames of the disagreements are not in the database'.format(len(rows) - len(found)))
+        
+        self.disagreements = np.zeros(self.n_frames, dtype=bool)
+        self.disagreements[found] = True
+        # kept up to date by the edits like nav_index, switching the mode costs nothing
+        self.disagreement_index = Navigation_Index(self.store.column('seen'), self.store.column('difficult'), self.shuffled_indices,
+                                                   self.shuffled_positions, eligible=(self.store.column('missing') == 0) & self.disagreements)
+        print('INFO: {} frames with disagreements loaded from {}'.format(len(found), path))
+        return len(found)
       
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+
+Export of the annotations as CSV, JSON lines or Parquet (pyarrow needed),
+without the annotation tool.
+
+    python export.py --annotations annotations.pickle --output labels.csv [--seen_only] [--exclude_out_of_body]
+    python export.py --annotations annotations.pickle --output labels/ --format parquet --per_video --workers 4
+
+The frames are written in chunks, so memory does not grow with the size of
+the dataset. With --per_video, every video is written to its own file in the
+output folder, several videos in parallel. The saved annotations are only
+read, the export can run while the annotation tool is open.
+"""
+
+import argparse
+import getpass
+import os
+from multiprocessing import Pool
+
+import numpy as np
+
+from annotation_store import Annotation_Store
+from journal import Change_Journal
+from sqlite_store import Sqlite_Store, sqlite_extensions
+
+export_formats = {'csv': '.csv', 'jsonl': '.jsonl', 'parquet': '.parquet'}
+
+
+def open_annotations(annotation_path, annotator=None):
+    """ store of the annotations saved at `annotation_path`, with the edits still in the
+    journal applied in memory. Nothing is written, the store does not need to be closed """
+    if os.path.splitext(annotation_path)[1] in sqlite_extensions:
+        store = Sqlite_Store(annotation_path, annotator or getpass.getuser())
+        # the frames and labels are read in memory when the store is opened
+        store.close()
+        return store
+
+    store_path = os.path.splitext(annotation_path)[0]
+    assert Annotation_Store.exists(store_path), 'no annotation store at {}, open the annotations once with the tool first'.format(store_path)
+    store = Annotation_Store(store_path, mode='r')
+    # the edits are applied to a copy of the flags, the mapped file is read-only
+    store.flags = np.array(store.flags)
+    for row, values in Change_Journal(store_path + '.journal').replay():
+        for field_name, value in values.items():
+            store.set(row, field_name, value)
+    return store
+
+
+def select_rows(store, video_ids=None, seen_only=False, exclude_out_of_body=False):
+    """ rows of the frames to export, frames whose file is missing are left out """
+    mask = store.column('missing') == 0
+    if video_ids is not None:
+        codes = [i for i, v in enumerate(store.video_ids) if v in set(video_ids)]
+        mask &= np.isin(store.video_idx, codes)
+    if seen_only:
+        mask &= store.column('seen') == 1
+    if exclude_out_of_body:
+        mask &= store.column('out_of_body') == 0
+    return np.flatnonzero(mask)
+
+
+def write_rows(store, rows, path, fmt, chunk_size=100000):
+    """ write the annotations of `rows` to `path`, `chunk_size` frames at a time """
+    if fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('pyarrow is needed for the parquet export: pip install pyarrow')
+
+    # written next to the output and renamed, a reader never sees half a file
+    tmp_path = path + '.tmp'
+    writer = None
+    with open(tmp_path, 'wb') as f:
+        # an empty selection still gives a file with the columns
+        for start in range(0, max(len(rows), 1), chunk_size):
+            chunk = store.to_dataframe(rows[start:start + chunk_size])
+            if fmt == 'csv':
+                f.write(chunk.to_csv(header=start == 0, index=False).encode('utf-8'))
+            elif fmt == 'jsonl':
+                if len(chunk) > 0:
+                    f.write(chunk.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n').encode('utf-8') + b'\n')
+            else:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(f, table.schema)
+                writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def _export_video_job(job):
+    annotation_path, annotator, video_id, path, fmt, seen_only, exclude_out_of_body, chunk_size = job
+    store = open_annotations(annotation_path, annotator)
+    rows = select_rows(store, [video_id], seen_only, exclude_out_of_body)
+    return write_rows(store, rows, path, fmt, chunk_size)
+
+
+def export(annotation_path, output, fmt=None, annotator=None, video_ids=None, seen_only=False,
+           exclude_out_of_body=False, per_video=False, n_workers=None, chunk_size=100000):
+    """ write the annotations to `output`, or to one file per video in the `output` folder
+    with `per_video`. Returns the number of exported frames """
+    if fmt is None:
+        fmt = {ext: f for f, ext in export_formats.items()}.get(os.path.splitext(output)[1], 'csv')
+    assert fmt in export_formats, 'unknown export format {}'.format(fmt)
+
+    store = open_annotations(annotation_path, annotator)
+
+    if not per_video:
+        n_rows = write_rows(store, select_rows(store, video_ids, seen_only, exclude_out_of_body), output, fmt, chunk_size)
+        print('INFO: {} frames exported to {}'.format(n_rows, output))
+        return n_rows
+
+    os.makedirs(output, exist_ok=True)
+    selected = store.video_ids if video_ids is None else [v for v in store.video_ids if v in set(video_ids)]
+    jobs = [(annotation_path, annotator, v, os.path.join(output, v + export_formats[fmt]), fmt, seen_only,
+             exclude_out_of_body, chunk_size) for v in selected]
+
+    n_rows = 0
+    with Pool(n_workers) as pool:
+        for i, n in enumerate(pool.imap_unordered(_export_video_job, jobs)):
+            n_rows += n
+            print('INFO: exported {} / {} videos'.format(i + 1, len(jobs)))
+    print('INFO: {} frames exported to {}'.format(n_rows, output))
+    return n_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the annotations as CSV, JSON lines or Parquet')
+    parser.add_argument('--annotations', default='annotations.pickle', help='annotation path, as in config.json')
+    parser.add_argument('--annotator', default=None, help='annotator name in a shared database')
+    parser.add_argument('--output', required=True, help='output file, or folder with --per_video')
+    parser.add_argument('--format', default=None, choices=sorted(export_formats), help='by default from the output extension, csv otherwise')
+    parser.add_argument('--videos', nargs='+', default=None, help='only export these videos')
+    parser.add_argument('--seen_only', action='store_true', help='only export the seen frames')
+    parser.add_argument('--exclude_out_of_body', action='store_true', help='leave out the out-of-body frames')
+    parser.add_argument('--per_video', action='store_true', help='one file per video in the output folder')
+    parser.add_argument('--workers', type=int, default=None, help='processes writing the videos with --per_video, all the cpus by default')
+    parser.add_argument('--chunk_size', type=int, default=100000, help='frames written at a time')
+    args = parser.parse_args()
+
+    export(args.annotations, args.output, args.format, args.annotator, args.videos, args.seen_only,
+           args.exclude_out_of_body, args.per_video, args.workers, args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
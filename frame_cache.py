@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+
+def image_nbytes(img):
+    if isinstance(img, bytes):
+        # encoded image
+        return len(img)
+    return img.size[0] * img.size[1] * len(img.getbands())
+
+
+class Frame_Cache:
+    """ LRU cache of display-ready images bounded by their size in bytes """
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            img = self._images.get(key)
+            if img is not None:
+                self._images.move_to_end(key)
+            return img
+
+    def put(self, key, img):
+        with self._lock:
+            if key in self._images:
+                self._images.move_to_end(key)
+                return
+
+            self._images[key] = img
+            self.n_bytes += image_nbytes(img)
+
+            while self.n_bytes > self.max_bytes and len(self._images) > 1:
+                _, old_img = self._images.popitem(last=False)
+                self.n_bytes -= image_nbytes(old_img)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._images
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self.n_bytes = 0
+
+
+class Frame_Prefetcher:
+    """ Decodes and resizes frames in a thread pool ahead of navigation.
+
+    `loader(path, size)` must return a PIL image ready to be displayed. Tk
+    objects can only be created on the Tk thread, so the workers stop at the
+    resized PIL image and the caller wraps it in a PhotoImage. """
+
+    def __init__(self, loader, n_workers=4, max_bytes=256 * 2**20):
+        self.loader = loader
+        self.cache = Frame_Cache(max_bytes)
+        self.executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix='prefetch')
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _load(self, key):
+        try:
+            img = self.loader(*key)
+            self.cache.put(key, img)
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+        return img
+
+    def get(self, path, size):
+        """ image for `path` at `size`, from the cache, an in-flight job or decoded now """
+        key = (path, tuple(size))
+
+        img = self.cache.get(key)
+        if img is not None:
+            return img
+
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            try:
+                return future.result()
+            except CancelledError:
+                pass
+
+        return self._load(key)
+
+    def prefetch(self, paths, size):
+        """ queue the frames likely to be shown next; drops queued jobs that are no longer wanted """
+        keys = [(path, tuple(size)) for path in paths]
+        wanted = set(keys)
+
+        with self._lock:
+            for key, future in list(self._pending.items()):
+                if key not in wanted and future.cancel():
+                    del self._pending[key]
+
+            for key in keys:
+                if key in self._pending or key in self.cache:
+                    continue
+                self._pending[key] = self.executor.submit(self._load, key)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
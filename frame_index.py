@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import numpy as np
+
+
+class Frame_Index:
+    """ Lookup of database rows by (video_id, frame_id_int).
+
+    Expects the rows to be sorted by video and frame id, as the database is,
+    so that the frames of a video form one contiguous, sorted range. """
+
+    def __init__(self, video_ids, frame_ids):
+        video_ids = np.asarray(video_ids)
+        self.frame_ids = np.asarray(frame_ids).astype(np.int64)
+
+        self.rows = dict(zip(zip(video_ids.tolist(), self.frame_ids.tolist()), range(len(self.frame_ids))))
+
+        # [start, stop) row range of every video
+        self.video_ranges = {}
+        if len(video_ids) > 0:
+            starts = np.concatenate([[0], np.flatnonzero(video_ids[1:] != video_ids[:-1]) + 1])
+            stops = np.append(starts[1:], len(video_ids))
+            for start, stop in zip(starts.tolist(), stops.tolist()):
+                self.video_ranges[video_ids[start]] = (start, stop)
+
+    def find(self, video_id, frame_id_int):
+        """ row of the frame, None if it is not in the database """
+        return self.rows.get((video_id, frame_id_int))
+
+    def find_at_or_after(self, video_id, frame_id_int):
+        """ row of the first frame of the video with an id >= frame_id_int, None if there is none """
+        if video_id not in self.video_ranges:
+            return None
+        start, stop = self.video_ranges[video_id]
+
+        row = start + int(np.searchsorted(self.frame_ids[start:stop], frame_id_int, side='left'))
+        if row >= stop:
+            return None
+        return row
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+from io import BytesIO
+
+from PIL import Image
+
+from instrumentation import timed
+
+def get_resized_img(img, video_size, resample=Image.LANCZOS):
+    """ resize image preserving aspect ratio
+    https://stackoverflow.com/a/54314043 """
+    width, height = video_size  # these are the MAX dimensions
+    video_ratio = width / height
+    img_ratio = img.size[0] / img.size[1]
+    if video_ratio >= 1:  # the video is wide
+        if img_ratio <= video_ratio:  # image is not wide enough
+            width_new = int(height * img_ratio)
+            size_new = width_new, height
+        else:  # image is wider than video
+            height_new = int(width / img_ratio)
+            size_new = width, height_new
+    else:  # the video is tall
+        if img_ratio >= video_ratio:  # image is not tall enough
+            height_new = int(width / img_ratio)
+            size_new = width, height_new
+        else:  # image is taller than video
+            width_new = int(height * img_ratio)
+            size_new = width_new, height
+    return img.resize(size_new, resample=resample)
+
+@timed('decode_resize')
+def load_display_image(path, size):
+    """ decode a frame and resize it to fit `size` """
+    image_raw = Image.open(path)
+    # lets the jpeg decoder skip the resolution that is thrown away by the resize
+    image_raw.draft('RGB', tuple(size))
+    return get_resized_img(image_raw, size)
+
+def encode_display_image(path, size, quality=85, loader=load_display_image):
+    """ frame resized to fit `size`, as jpeg bytes """
+    buf = BytesIO()
+    loader(path, size).convert('RGB').save(buf, 'JPEG', quality=quality)
+    return buf.getvalue()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import json
+import os
+import time
+from glob import glob1
+
+from journal import _json_default
+from instrumentation import timed
+
+
+class History_Store:
+    """ Segmented, append-only log of the edits made to the annotations.
+
+    Each edit is stored as one json line (a delta) holding the row, the frame it
+    belongs to and the old/new value of every changed field. A new segment file
+    is started every `segment_size` deltas so that no file grows without bound
+    and old segments can be archived or deleted. """
+
+    def __init__(self, history_dir, segment_size=10000):
+        self.history_dir = history_dir
+        self.segment_size = segment_size
+        os.makedirs(self.history_dir, exist_ok=True)
+
+        self._handle = None
+
+        segments = self.list_segments()
+        if segments:
+            self.segment_idx = int(segments[-1].split('_')[1].split('.')[0])
+            # only the last segment is read, its size is bounded by segment_size
+            with open(os.path.join(self.history_dir, segments[-1]), 'r', encoding='utf-8') as f:
+                self.segment_count = sum(1 for _ in f)
+        else:
+            self.segment_idx = 0
+            self.segment_count = 0
+
+    def list_segments(self):
+        return sorted(glob1(self.history_dir, 'history_*.jsonl'))
+
+    def segment_path(self, segment_idx):
+        return os.path.join(self.history_dir, 'history_{:06d}.jsonl'.format(segment_idx))
+
+    @staticmethod
+    def make_delta(row, video_id, frame_id_int, changes, op='edit'):
+        """ changes: {field_name: (old_value, new_value)} """
+        return {
+            'time': time.time(),
+            'op': op,
+            'row': row,
+            'video_id': video_id,
+            'frame_id_int': frame_id_int,
+            'changes': {k: list(v) for k, v in changes.items()},
+            }
+
+    def append(self, row, video_id, frame_id_int, changes, op='edit'):
+        self.write([self.make_delta(row, video_id, frame_id_int, changes, op)])
+
+    @timed('history.write')
+    def write(self, deltas):
+        """ append deltas, with a single flush """
+        for delta in deltas:
+            if self.segment_count >= self.segment_size:
+                self.rotate()
+            if self._handle is None:
+                self._handle = open(self.segment_path(self.segment_idx), 'a', encoding='utf-8')
+            self._handle.write(json.dumps(delta, default=_json_default) + '\n')
+            self.segment_count += 1
+
+        if self._handle is not None:
+            self._handle.flush()
+
+    def rotate(self):
+        """ close the current segment and start a new one """
+        self.close()
+        self.segment_idx += 1
+        self.segment_count = 0
+
+    def iter_deltas(self):
+        """ yields every stored delta, oldest first """
+        for segment in self.list_segments():
+            with open(os.path.join(self.history_dir, segment), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # torn write at the end of a segment
+                        continue
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import csv
+import functools
+import json
+import threading
+import time
+from collections import deque
+
+
+class Timings:
+    """ Rolling durations of the instrumented operations.
+
+    The last `window` durations of every operation are kept in memory, from
+    which summary() gives the percentiles. Nothing is recorded unless
+    `enabled` is set, so the instrumentation costs one attribute lookup when
+    it is off. """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.enabled = False
+        self.counts = {}
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            if name not in self._durations:
+                self._durations[name] = deque(maxlen=self.window)
+                self.counts[name] = 0
+            self._durations[name].append(seconds)
+            self.counts[name] += 1
+
+    def summary(self):
+        """ {name: {n, last, p50, p95, p99, max}}, durations in milliseconds over the window """
+        import numpy as np
+        with self._lock:
+            durations = {name: np.array(d) * 1000. for name, d in self._durations.items()}
+            counts = dict(self.counts)
+
+        summary = {}
+        for name, ms in sorted(durations.items()):
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            summary[name] = {'n': counts[name], 'last': float(ms[-1]), 'p50': float(p50), 'p95': float(p95),
+                             'p99': float(p99), 'max': float(ms.max())}
+        return summary
+
+    def dump(self, path, info=None):
+        """ write the summary as json, or as csv if `path` ends with .csv. `info` is
+        saved along in the json (dataset size, storage...) """
+        summary = self.summary()
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['name', 'n', 'last', 'p50', 'p95', 'p99', 'max'])
+                for name, s in summary.items():
+                    writer.writerow([name, s['n'], s['last'], s['p50'], s['p95'], s['p99'], s['max']])
+        else:
+            with open(path, 'w') as f:
+                json.dump({'time': time.time(), 'unit': 'ms', 'window': self.window, 'info': info or {},
+                           'timings': summary}, f, indent=1)
+
+
+# shared by every instrumented module
+timings = Timings()
+
+
+def timed(name):
+    """ decorator recording the duration of every call in `timings` under `name` """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not timings.enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                timings.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import json
+import os
+
+import numpy as np
+
+from instrumentation import timed
+
+
+def _json_default(o):
+    """ numpy scalars coming from the database are not json serializable """
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(o).__name__))
+
+
+class Change_Journal:
+    """ Append-only log of the edits made since the last database snapshot.
+
+    Every record is one json line {"row": <row>, "values": {<field>: <value>}}
+    and is fsynced before append() returns. Replaying the records on top of the
+    snapshot gives back the current state; a torn line (crash while writing) is
+    ignored, and the records appended after it start on a new line. """
+
+    def __init__(self, path):
+        self.path = path
+        self.n_records = 0
+        # set by replay when a torn or corrupted record was skipped
+        self.torn = False
+        self._handle = None
+
+    def replay(self):
+        """ yields (row, values) for every complete record in the journal. The file is
+        only read, the owner compacts it when `torn` is set """
+        self.n_records = 0
+        self.torn = False
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    # only the last line can be incomplete
+                    print('WARNING: ignoring incomplete journal record ', self.path)
+                    self.torn = True
+                    break
+                try:
+                    record = json.loads(line)
+                    row, values = record['row'], record['values']
+                except (ValueError, KeyError, TypeError):
+                    # a torn record followed by the records appended after it
+                    print('WARNING: ignoring corrupted journal record ', self.path)
+                    self.torn = True
+                    continue
+                self.n_records += 1
+                yield row, values
+
+    def _open(self):
+        if self._handle is None:
+            # a record is never appended to the end of a torn one
+            needs_newline = False
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    needs_newline = f.read(1) != b'\n'
+            self._handle = open(self.path, 'a', encoding='utf-8')
+            if needs_newline:
+                self._handle.write('\n')
+        return self._handle
+
+    def append(self, row, values):
+        self.append_many([(row, values)])
+
+    @timed('journal.append')
+    def append_many(self, records):
+        """ append (row, values) records, with a single fsync """
+        handle = self._open()
+        for row, values in records:
+            handle.write(json.dumps({'row': row, 'values': values}, default=_json_default) + '\n')
+        handle.flush()
+        os.fsync(handle.fileno())
+        self.n_records += len(records)
+
+    def truncate(self):
+        """ called once the in-memory state has been saved as a full snapshot """
+        self.close()
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.n_records = 0
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+
+Merge of the annotations of several annotators, and import of labels (e.g.
+model predictions) as pre-labels.
+
+    python merge.py --inputs alice.pickle bob.pickle carol.pickle --output merged.pickle [--policy majority] [--report conflicts.csv]
+    python merge.py --inputs predictions.csv --into annotations.pickle
+
+The inputs are annotations.pickle files, exports (.csv, .jsonl, .parquet) or
+shared .sqlite databases, the annotator of a database being given by --names.
+Frames are matched on (video_id, frame_id_int); an input only needs these two
+columns and the fields it sets. With --into, the merge is written into the
+annotations of the tool (which must be closed): the frames already seen there
+keep their labels whatever the policy, and the other frames are merged from the
+inputs followed by the labels of the tool. Fields missing from an input
+are 0, and fields of 0.5 or more (e.g. the scores of a model) are set.
+
+Policies:
+    prefer_seen         the labels of the first input that has seen the frame,
+                        or of the first input that has the frame if none has
+    prefer_annotator    the labels of --prefer when it has the frame
+    majority            majority vote per field among the inputs that have seen
+                        the frame, ties go to the prefer_seen choice
+--prefer puts an annotator first for every policy. The conflict report lists
+every field on which the inputs that have seen a frame disagree.
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from annotation_store import Annotation_Store, Store_Lock, flag_fields, status_bits
+from journal import Change_Journal
+from export import open_annotations
+from sqlite_store import Sqlite_Store, sqlite_extensions
+
+merge_policies = ['prefer_seen', 'prefer_annotator', 'majority']
+
+_seen = flag_fields.index('seen')
+
+
+def read_annotations(path, name=None):
+    """ DataFrame of the annotations at `path`, missing fields are 0 and missing comments empty """
+    ext = os.path.splitext(path)[1]
+    if ext in sqlite_extensions:
+        assert name is not None, 'the annotator of {} has to be given with --names'.format(path)
+        store = open_annotations(path, name)
+        df = store.to_dataframe(np.flatnonzero(store.column('missing') == 0))
+    elif ext == '.csv':
+        df = pd.read_csv(path, dtype={'video_id': str, 'frame_id': str, 'comment': str})
+    elif ext == '.jsonl':
+        df = pd.read_json(path, lines=True, dtype={'video_id': str, 'frame_id': str, 'comment': str})
+    elif ext == '.parquet':
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_pickle(path)
+
+    if 'frame_id_int' not in df:
+        assert 'frame_id' in df, '{} has neither frame_id_int nor frame_id'.format(path)
+        df['frame_id_int'] = df['frame_id'].astype(int)
+    assert 'video_id' in df, '{} has no video_id'.format(path)
+    df['video_id'] = df['video_id'].astype(str)
+    return df
+
+
+class Aligned_Annotations:
+    """ Annotations of several inputs aligned on the same frames.
+
+        keys        sorted int64 (video code << 32 | frame_id_int) of the frames
+        video_ids   video of each code
+        present     bool (n_inputs, n_frames) frames of each input
+        values      int8 (n_inputs, n_frames, n_fields) flags, -1 where an input does not have
+                    the frame or does not have the field
+        comments    object (n_inputs, n_frames), None where an input does not have the frame
+                    or has no comments
+        frame_ids   zero padded frame id of each frame, from the inputs that have one
+
+    Rows are matched with a hash join of the keys of each input on the keys of
+    the frames. The frames are those of `keys` if given, else all the frames
+    of the inputs. """
+
+    def __init__(self, frames, keys=None, video_ids=None):
+        if video_ids is None:
+            video_ids = sorted(set().union(*(pd.unique(df['video_id']) for df in frames)))
+        self.video_ids = list(video_ids)
+        video_index = pd.Index(self.video_ids)
+
+        input_keys = []
+        for df in frames:
+            codes = video_index.get_indexer(df['video_id']).astype(np.int64)
+            frame_id_int = df['frame_id_int'].values.astype(np.int64)
+            input_keys.append(np.where(codes < 0, -1, (codes << 32) | frame_id_int))
+
+        self.keys = np.unique(np.concatenate(input_keys)) if keys is None else np.asarray(keys)
+        self.keys = self.keys[self.keys >= 0]
+        key_index = pd.Index(self.keys)
+
+        n_frames = len(self.keys)
+        self.present = np.zeros((len(frames), n_frames), dtype=bool)
+        self.values = np.full((len(frames), n_frames, len(flag_fields)), -1, dtype=np.int8)
+        self.comments = np.full((len(frames), n_frames), None, dtype=object)
+        self.frame_ids = np.full(n_frames, None, dtype=object)
+        self.n_unmatched = []
+        self.n_duplicates = []
+
+        for i, (df, k) in enumerate(zip(frames, input_keys)):
+            rows = key_index.get_indexer(k)
+            matched = rows >= 0
+            self.n_unmatched.append(int(np.count_nonzero(~matched)))
+            self.n_duplicates.append(int(matched.sum() - len(np.unique(rows[matched]))))
+            rows = rows[matched]
+            self.present[i, rows] = True
+
+            values = np.full((len(rows), len(flag_fields)), -1, dtype=np.int8)
+            for j, field_name in enumerate(flag_fields):
+                if field_name in df:
+                    # scores of a model are set from 0.5
+                    values[:, j] = df[field_name].values[matched] >= 0.5
+            self.values[i, rows] = values
+
+            if 'comment' in df:
+                comments = df['comment'].values[matched]
+                self.comments[i, rows] = np.where(pd.isna(comments), '', comments)
+
+            if 'frame_id' in df:
+                unset = self.frame_ids[rows] == None
+                self.frame_ids[rows[unset]] = df['frame_id'].values[matched][unset]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def voters(self, seen_only=False):
+        """ (n_inputs, n_frames) inputs that have seen each frame, or that have it if none has
+        seen it and not `seen_only` """
+        voters = self.values[:, :, _seen] == 1
+        if not seen_only:
+            none_seen = ~voters.any(axis=0)
+            voters[:, none_seen] = self.present[:, none_seen]
+        return voters
+
+    def conflicts(self):
+        """ (n_frames, n_fields) fields on which the inputs that have seen a frame disagree """
+        voters = self.voters(seen_only=True)[:, :, None]
+        return ((self.values == 1) & voters).any(axis=0) & ((self.values == 0) & voters).any(axis=0)
+
+    def merge(self, policy='prefer_seen', prefer=None):
+        """ merged flags (n_frames, n_fields) and comments. The inputs are in order of
+        priority, `prefer` is the index of the preferred one. Each field is taken from the
+        first candidate input that has it, or from the first input that has it if none has """
+        assert policy in merge_policies, 'unknown merge policy {}'.format(policy)
+        n_inputs, n_frames = self.values.shape[:2]
+        order = np.arange(n_inputs)
+        if prefer is not None:
+            order = np.concatenate([[prefer], order[order != prefer]])
+
+        def first(provided, candidates):
+            # index of the first input in the order of priority
+            selected = candidates & provided
+            selected = np.where(selected.any(axis=0), selected, provided)
+            return order[selected[order].argmax(axis=0)]
+
+        candidates = self.present if policy == 'prefer_annotator' else self.voters()
+        provided = self.values >= 0
+        chosen = first(provided, candidates[:, :, None])
+        merged = np.take_along_axis(self.values, chosen[None], axis=0)[0]
+        # fields that no input has
+        merged = np.maximum(merged, 0).astype(np.uint8)
+
+        if policy == 'majority':
+            voters = self.voters()[:, :, None] & provided
+            votes = (voters & (self.values == 1)).sum(axis=0)
+            n_voters = voters.sum(axis=0)
+            decided = 2 * votes != n_voters
+            merged[decided] = (2 * votes > n_voters)[decided]
+
+        has_comment = self.comments != None
+        chosen = first(has_comment, candidates)
+        comments = self.comments[chosen, np.arange(n_frames)]
+        comments[comments == None] = ''
+        return merged, comments
+
+    def keep_seen(self, merged, comments, i):
+        """ give back to the frames input `i` has seen its own labels and comments, whatever
+        the policy. Returns the number of these frames """
+        own = (self.values[i, :, _seen] == 1) & (self.values[i] >= 0).all(axis=1)
+        merged[own] = self.values[i, own]
+        has_comment = own & (self.comments[i] != None)
+        comments[has_comment] = self.comments[i, has_comment]
+        return int(own.sum())
+
+    def to_dataframe(self, merged, comments):
+        frame_id_int = (self.keys & 0xffffffff).astype(int)
+        frame_ids = np.where(self.frame_ids == None, frame_id_int.astype(str), self.frame_ids)
+        df = pd.DataFrame({'video_id': np.asarray(self.video_ids, dtype=object)[self.keys >> 32],
+                           'frame_id': frame_ids, 'frame_id_int': frame_id_int})
+        for j, field_name in enumerate(flag_fields):
+            df[field_name] = merged[:, j].astype(int)
+        df['comment'] = comments
+        return df
+
+
+def conflict_report(aligned, names, merged):
+    """ DataFrame of the fields on which the inputs that have seen a frame disagree,
+    one line per frame and field with the value of each of these inputs and the merged value """
+    voters = aligned.voters()
+    frames, fields = np.nonzero(aligned.conflicts())
+    report = pd.DataFrame({
+        'video_id': np.asarray(aligned.video_ids, dtype=object)[aligned.keys[frames] >> 32],
+        'frame_id_int': aligned.keys[frames] & 0xffffffff,
+        'field': np.asarray(flag_fields, dtype=object)[fields],
+        })
+    for i, name in enumerate(names):
+        # empty where the input has not seen the frame
+        values = np.where(voters[i, frames], aligned.values[i, frames, fields], -1)
+        report[name] = pd.Series(values).astype('Int64').mask(values < 0)
+    report['merged'] = merged[frames, fields].astype(int)
+    return report
+
+
+def write_dataframe(df, path):
+    """ write as pickle (the former database format), or as csv, jsonl or parquet from the extension """
+    tmp_path = path + '.tmp'
+    ext = os.path.splitext(path)[1]
+    if ext == '.csv':
+        df.to_csv(tmp_path, index=False)
+    elif ext == '.jsonl':
+        df.to_json(tmp_path, orient='records', lines=True, force_ascii=False)
+    elif ext == '.parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def open_target(annotation_path, annotator=None):
+    """ (store, lock) of the annotations of the tool, with the journal applied and truncated.
+    The store is locked until the lock is released, and can not be opened while the tool has it """
+    if os.path.splitext(annotation_path)[1] in sqlite_extensions:
+        assert annotator is not None, 'the annotator of {} has to be given with --annotator'.format(annotation_path)
+        return Sqlite_Store(annotation_path, annotator), None
+
+    store_path = os.path.splitext(annotation_path)[0]
+    assert Annotation_Store.exists(store_path), 'no annotation store at {}, open the annotations once with the tool first'.format(store_path)
+    lock = Store_Lock(store_path)
+    lock.acquire()
+    store = Annotation_Store(store_path)
+    journal = Change_Journal(store_path + '.journal')
+    for row, values in journal.replay():
+        for field_name, value in values.items():
+            store.set(row, field_name, value)
+    store.flush()
+    journal.truncate()
+    return store, lock
+
+
+def write_into(store, merged, comments):
+    """ write the merged labels of the frames of the store, rows in the same order.
+    Returns the number of frames whose labels changed """
+    new_flags = (merged.astype(np.uint16) << np.arange(len(flag_fields), dtype=np.uint16)).sum(axis=1).astype(np.uint16)
+    old_flags = np.asarray(store.flags) & np.uint16((1 << len(flag_fields)) - 1)
+    old_comments = store.column('comment')
+    changed = np.flatnonzero((new_flags != old_flags) | (comments != old_comments))
+
+    if isinstance(store, Sqlite_Store):
+        records = []
+        for row in changed.tolist():
+            values = {f: int(merged[row, j]) for j, f in enumerate(flag_fields)}
+            values['comment'] = comments[row]
+            records.append((row, values))
+        store.write_labels(records)
+    else:
+        store.flags[changed] = new_flags[changed] | (store.flags[changed] & np.uint16(1 << status_bits['missing']))
+        for row in changed.tolist():
+            store.set(row, 'comment', comments[row])
+    store.flush()
+    return len(changed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge the annotations of several annotators, or import pre-labels')
+    parser.add_argument('--inputs', nargs='+', required=True, help='annotations.pickle, .csv, .jsonl, .parquet or .sqlite')
+    parser.add_argument('--names', nargs='+', default=None, help='name of each input (annotator of a .sqlite), the file names by default')
+    parser.add_argument('--output', default=None, help='merged annotations, .pickle, .csv, .jsonl or .parquet')
+    parser.add_argument('--into', default=None, help='annotation path of the tool to merge the inputs into')
+    parser.add_argument('--annotator', default=None, help='annotator of --into when it is a .sqlite database')
+    parser.add_argument('--policy', default='prefer_seen', choices=merge_policies)
+    parser.add_argument('--prefer', default=None, help='name of the preferred input')
+    parser.add_argument('--report', default=None, help='csv of the conflicts between the inputs')
+    args = parser.parse_args()
+
+    assert (args.output is None) != (args.into is None), 'give either --output or --into'
+    names = args.names or [os.path.splitext(os.path.basename(p))[0] for p in args.inputs]
+    assert len(names) == len(args.inputs), 'one name per input'
+
+    start = time.perf_counter()
+    frames = [read_annotations(p, n) for p, n in zip(args.inputs, names)]
+
+    store = None
+    keys = video_ids = None
+    if args.into is not None:
+        store, lock = open_target(args.into, args.annotator)
+        # the frames are those of the tool, its labels come last but win on the frames it has seen
+        video_ids = store.video_ids
+        keys = (np.asarray(store.video_idx, dtype=np.int64) << 32) | np.asarray(store.frame_id_int, dtype=np.int64)
+        frames.append(store.to_dataframe())
+        names.append(args.annotator or 'current')
+    print('INFO: inputs read in {:.1f}s'.format(time.perf_counter() - start))
+
+    aligned = Aligned_Annotations(frames, keys, video_ids)
+    for name, df, n_unmatched, n_duplicates in zip(names, frames, aligned.n_unmatched, aligned.n_duplicates):
+        print('INFO: {}: {} frames'.format(name, len(df)))
+        if n_unmatched:
+            print('WARNING: {}: {} frames are not in the dataset and are ignored'.format(name, n_unmatched))
+        if n_duplicates:
+            print('WARNING: {}: {} duplicated frames, the last one is used'.format(name, n_duplicates))
+
+    prefer = None
+    if args.prefer is not None:
+        assert args.prefer in names, 'unknown input {}'.format(args.prefer)
+        prefer = names.index(args.prefer)
+    assert args.policy != 'prefer_annotator' or prefer is not None, 'prefer_annotator needs --prefer'
+
+    merged, comments = aligned.merge(args.policy, prefer)
+    if store is not None:
+        # the work of the annotator is never overwritten
+        n_kept = aligned.keep_seen(merged, comments, len(frames) - 1)
+        print('INFO: {} frames seen in {} keep their labels'.format(n_kept, args.into))
+
+    report = conflict_report(aligned, names, merged)
+    print('INFO: {} conflicts on {} frames'.format(len(report), report[['video_id', 'frame_id_int']].drop_duplicates().shape[0]))
+    for field_name, n in report['field'].value_counts().items():
+        print('    {:<24}{:>9}'.format(field_name, n))
+    if args.report is not None:
+        report.to_csv(args.report, index=False)
+        print('INFO: conflict report written to ', args.report)
+
+    if store is not None:
+        n_changed = write_into(store, merged, comments)
+        store.close()
+        if lock is not None:
+            lock.release()
+        print('INFO: {} frames updated in {}'.format(n_changed, args.into))
+    else:
+        write_dataframe(aligned.to_dataframe(merged, comments), args.output)
+        print('INFO: {} frames written to {}'.format(len(aligned), args.output))
+    print('INFO: done in {:.1f}s'.format(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import numpy as np
+
+
+class Fenwick_Set:
+    """ Set of positions in [0, n) backed by a Fenwick (binary indexed) tree.
+
+    Insertion, removal, rank and select are O(log n), which gives the
+    successor/predecessor of any position in O(log n) as well. """
+
+    def __init__(self, mask):
+        self.n = len(mask)
+        self.mask = np.array(mask, dtype=bool)
+
+        cumsum = np.zeros(self.n + 1, dtype=np.int64)
+        np.cumsum(self.mask, out=cumsum[1:])
+        i = np.arange(1, self.n + 1)
+        self.tree = np.zeros(self.n + 1, dtype=np.int32)
+        self.tree[1:] = cumsum[i] - cumsum[i - (i & -i)]
+
+        self.size = int(cumsum[-1])
+        self._top_bit = 1 << (self.n.bit_length() - 1) if self.n > 0 else 0
+
+    def __contains__(self, position):
+        return bool(self.mask[position])
+
+    def _update(self, position, delta):
+        i = position + 1
+        while i <= self.n:
+            self.tree[i] += delta
+            i += i & -i
+        self.size += delta
+
+    def add(self, position):
+        if not self.mask[position]:
+            self.mask[position] = True
+            self._update(position, 1)
+
+    def remove(self, position):
+        if self.mask[position]:
+            self.mask[position] = False
+            self._update(position, -1)
+
+    def rank(self, position):
+        """ number of members strictly before `position` """
+        count = 0
+        i = position
+        while i > 0:
+            count += int(self.tree[i])
+            i -= i & -i
+        return count
+
+    def select(self, k):
+        """ position of the k-th member (0-based) """
+        position = 0
+        bit = self._top_bit
+        while bit:
+            nxt = position + bit
+            if nxt <= self.n and self.tree[nxt] <= k:
+                position = nxt
+                k -= int(self.tree[nxt])
+            bit >>= 1
+        return position
+
+    def successor(self, position):
+        """ first member after `position`, None if there is none """
+        k = self.rank(position + 1)
+        if k >= self.size:
+            return None
+        return self.select(k)
+
+    def predecessor(self, position):
+        """ last member before `position`, None if there is none """
+        k = self.rank(position)
+        if k == 0:
+            return None
+        return self.select(k - 1)
+
+    def first(self):
+        return self.select(0) if self.size > 0 else None
+
+    def last(self):
+        return self.select(self.size - 1) if self.size > 0 else None
+
+
+class Navigation_Index:
+    """ Positions of the frames grouped by their (seen, difficult) flags, in the
+    natural and in the shuffled order.
+
+    Every navigation filter (skip seen, only seen, only difficult) selects a
+    union of these groups, so the next frame passing the filters is the nearest
+    successor over at most four sets. """
+
+    def __init__(self, seen, difficult, shuffled_indices, shuffled_positions, eligible=None):
+        seen = np.asarray(seen).astype(bool)
+        difficult = np.asarray(difficult).astype(bool)
+        self.n = len(seen)
+
+        # rows that are not eligible (e.g. missing files) are never navigated to
+        if eligible is None:
+            eligible = np.ones(self.n, dtype=bool)
+        self.eligible = np.asarray(eligible).astype(bool)
+        self.n_excluded = int(self.n - np.count_nonzero(self.eligible))
+
+        self.row_class = seen.astype(np.int8) * 2 + difficult.astype(np.int8)
+
+        self.shuffled_positions = shuffled_positions
+        shuffled_class = self.row_class[shuffled_indices]
+        shuffled_eligible = self.eligible[shuffled_indices]
+
+        self.sets = {
+            False: [Fenwick_Set((self.row_class == c) & self.eligible) for c in range(4)],
+            True: [Fenwick_Set((shuffled_class == c) & shuffled_eligible) for c in range(4)],
+            }
+
+    @staticmethod
+    def allowed_classes(skip_seen, only_seen, only_difficult):
+        seen_values = [s for s in (0, 1) if not (skip_seen and s) and not (only_seen and not s)]
+        difficult_values = [d for d in (0, 1) if not (only_difficult and not d)]
+        return [s * 2 + d for s in seen_values for d in difficult_values]
+
+    def update(self, row, seen, difficult):
+        new_class = int(bool(seen)) * 2 + int(bool(difficult))
+        old_class = self.row_class[row]
+        if new_class == old_class:
+            return
+        self.row_class[row] = new_class
+        if not self.eligible[row]:
+            return
+
+        for shuffled, position in ((False, row), (True, self.shuffled_positions[row])):
+            self.sets[shuffled][old_class].remove(position)
+            self.sets[shuffled][new_class].add(position)
+
+    def find(self, position, step, shuffled, classes):
+        """ nearest position after (step=1) or before (step=-1) `position`, cyclically,
+        whose frame belongs to one of `classes`. `position` itself is only returned
+        as a last resort, and also when no frame matches """
+        best = position
+        best_distance = self.n + 1
+        for c in classes:
+            fset = self.sets[shuffled][c]
+            if step > 0:
+                candidate = fset.successor(position)
+                if candidate is None:
+                    candidate = fset.first()
+            else:
+                candidate = fset.predecessor(position)
+                if candidate is None:
+                    candidate = fset.last()
+            if candidate is None:
+                continue
+
+            distance = ((candidate - position) * step) % self.n
+            if distance == 0:
+                distance = self.n
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+
+        return best
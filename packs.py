@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+
+Packed dataset: the frames of each video concatenated in a single file, so
+that reading a frame does not open a file (one metadata round trip per frame
+on a network file system).
+
+    python packs.py --datapath <frames> --pack_dir <packs>
+
+writes <pack_dir>/<video>.pack and its index <video>.index.npz for every video
+folder. Running it again repacks the videos whose frames were added, removed or
+modified, or every video with --force. Set "pack_dir" in config.json to read
+the frames from the packs.
+"""
+
+import argparse
+import os
+import threading
+from io import BytesIO
+from multiprocessing import Pool
+
+import numpy as np
+
+from scanner import list_video_dirs, scan_video_dir
+from frame_loader import load_display_image
+
+
+def pack_paths(pack_dir, video_id):
+    return os.path.join(pack_dir, video_id + '.pack'), os.path.join(pack_dir, video_id + '.index.npz')
+
+
+def _frame_names(frame_ids, widths, extensions):
+    return [str(frame_id_int).zfill(int(width)) + '.' + ext for frame_id_int, width, ext in zip(frame_ids, widths, extensions)]
+
+
+def _is_up_to_date(video_path, index_path, frame_ids, names):
+    """ the frames of the index are those of the folder, with the same modification times """
+    try:
+        with np.load(index_path) as saved:
+            frames = saved['frames']
+    except (OSError, ValueError, KeyError):
+        return False
+    if len(frames) != len(frame_ids) or not np.array_equal(frames[:, 0], frame_ids):
+        return False
+    mtimes = [os.stat(os.path.join(video_path, name)).st_mtime_ns for name in names]
+    return np.array_equal(frames[:, 3], mtimes)
+
+
+def build_pack(datapath, pack_dir, video_id, force=False):
+    """ pack the frames of a video folder, unless the pack has the same frames, with the
+    same modification times, as the folder. Returns the number of packed frames, 0 if the
+    pack was up to date """
+    pack_path, index_path = pack_paths(pack_dir, video_id)
+    video_path = os.path.join(datapath, video_id)
+
+    # sorted by frame id
+    frame_ids, widths, extensions = scan_video_dir(video_path)
+    names = _frame_names(frame_ids, widths, extensions)
+    if not force and _is_up_to_date(video_path, index_path, np.asarray(frame_ids, dtype=np.int64), names):
+        return 0
+
+    # frame id, offset, length and modification time of each frame in the pack
+    frames = np.zeros((len(frame_ids), 4), dtype=np.int64)
+    offset = 0
+    with open(pack_path + '.tmp', 'wb') as f:
+        for i, (frame_id_int, name) in enumerate(zip(frame_ids, names)):
+            with open(os.path.join(video_path, name), 'rb') as frame_file:
+                data = frame_file.read()
+                mtime = os.fstat(frame_file.fileno()).st_mtime_ns
+            f.write(data)
+            frames[i] = (frame_id_int, offset, len(data), mtime)
+            offset += len(data)
+
+    # the index records the size and modification time of its pack (kept by the rename),
+    # a reader opening the new pack with the old index, or the reverse, rejects the pair
+    pack_stat = os.stat(pack_path + '.tmp')
+    pack = np.array([pack_stat.st_size, pack_stat.st_mtime_ns], dtype=np.int64)
+    with open(index_path + '.tmp', 'wb') as f:
+        np.savez(f, frames=frames, pack=pack)
+    os.replace(pack_path + '.tmp', pack_path)
+    os.replace(index_path + '.tmp', index_path)
+    return len(frame_ids)
+
+
+def _build_pack_job(job):
+    try:
+        return build_pack(*job)
+    except Exception as e:
+        print('WARNING: could not pack the video ', job[2], e)
+        return 0
+
+
+def build_packs(datapath, pack_dir, n_workers=None, force=False):
+    """ pack every video folder of the dataset, one video per worker process """
+    os.makedirs(pack_dir, exist_ok=True)
+    video_ids = list_video_dirs(datapath)
+
+    n_frames = 0
+    with Pool(n_workers) as pool:
+        jobs = [(datapath, pack_dir, v, force) for v in video_ids]
+        for i, n in enumerate(pool.imap_unordered(_build_pack_job, jobs)):
+            n_frames += n
+            print('INFO: packed {} / {} videos'.format(i + 1, len(jobs)))
+    print('INFO: {} frames packed'.format(n_frames))
+    return n_frames
+
+
+class Pack_Reader:
+    """ Reads frames from the packs of `pack_dir`. The packs are memory-mapped
+    when first used, a frame is a slice of the mapping """
+
+    def __init__(self, pack_dir):
+        self.pack_dir = pack_dir
+        self._packs = {}
+        self._lock = threading.Lock()
+
+    def _open(self, video_id):
+        with self._lock:
+            if video_id not in self._packs:
+                pack_path, index_path = pack_paths(self.pack_dir, video_id)
+                try:
+                    with np.load(index_path) as saved:
+                        index, pack = saved['frames'], saved['pack']
+                    pack_stat = os.stat(pack_path)
+                    if (pack_stat.st_size, pack_stat.st_mtime_ns) != tuple(pack.tolist()):
+                        # the pack is being replaced, tried again on the next read
+                        return None
+                    data = np.memmap(pack_path, dtype=np.uint8, mode='r') if pack_stat.st_size > 0 else None
+                    self._packs[video_id] = (index, data)
+                except (OSError, ValueError, KeyError):
+                    self._packs[video_id] = None
+            return self._packs[video_id]
+
+    def read(self, video_id, frame_id_int):
+        """ bytes of the frame file, None if it is not packed """
+        pack = self._open(video_id)
+        if pack is None:
+            return None
+        index, data = pack
+        i = np.searchsorted(index[:, 0], frame_id_int)
+        if i == len(index) or index[i, 0] != frame_id_int:
+            return None
+        _, offset, length, _ = index[i]
+        return data[offset:offset + length].tobytes()
+
+
+class Pack_Loader:
+    """ Frame_Prefetcher loader reading the frames of `datapath` from their packs,
+    and from the frame files for the videos that are not packed """
+
+    def __init__(self, datapath, pack_dir):
+        self.datapath = datapath
+        self.reader = Pack_Reader(pack_dir)
+
+    def __call__(self, path, size):
+        video_id, name = os.path.split(os.path.relpath(path, self.datapath))
+        data = self.reader.read(video_id, int(os.path.splitext(name)[0]))
+        return load_display_image(BytesIO(data) if data is not None else path, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack the frames of each video in a single file')
+    parser.add_argument('--datapath', required=True, help='folder containing the frames organized in folders per video')
+    parser.add_argument('--pack_dir', required=True, help='output folder')
+    parser.add_argument('--workers', type=int, default=None, help='processes, all the cpus by default')
+    parser.add_argument('--force', action='store_true', help='repack every video, even the ones that are up to date')
+    args = parser.parse_args()
+
+    build_packs(args.datapath, args.pack_dir, args.workers, args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+
+Display-sized copies (proxies) of the frames, so that the annotation tool
+does not decode and downsample the full resolution frames on every view.
+
+    python proxies.py --datapath <frames> --proxy_dir <proxies> [--sizes 640 1280] [--format jpeg]
+
+builds <proxy_dir>/<size>/<video>/<frame>.jpg for every frame, the long side
+of a proxy being at most <size>. Set "proxy_dir" in config.json to use them.
+"""
+
+import argparse
+import os
+import threading
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+from scanner import scan_dataset, print_progress
+from annotation_store import format_frame_ids
+from frame_loader import load_display_image
+
+proxy_sizes = (640, 1280)
+
+proxy_formats = {'jpeg': '.jpg', 'webp': '.webp'}
+
+
+def proxy_path(proxy_dir, size, relative_path, fmt='jpeg'):
+    """ path of the proxy of a frame given by its path relative to the dataset folder """
+    return os.path.join(proxy_dir, str(size), os.path.splitext(relative_path)[0] + proxy_formats[fmt])
+
+
+def make_proxy(src, dst, size, fmt='jpeg', quality=90):
+    """ write the proxy of `src`, unless it is already newer than the frame. Returns True if it was written """
+    try:
+        if os.stat(dst).st_mtime_ns >= os.stat(src).st_mtime_ns:
+            return False
+    except FileNotFoundError:
+        pass
+
+    img = Image.open(src)
+    img.draft('RGB', (size, size))
+    img = img.convert('RGB')
+    img.thumbnail((size, size), resample=Image.LANCZOS)
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    # written next to the proxy and renamed, a reader never sees half a file
+    tmp = '{}.{}.{}.tmp'.format(dst, os.getpid(), threading.get_ident())
+    img.save(tmp, format=fmt.upper(), quality=quality)
+    os.replace(tmp, dst)
+    return True
+
+
+def _make_proxy_job(job):
+    try:
+        return make_proxy(*job)
+    except Exception as e:
+        print('WARNING: could not make the proxy of ', job[0], e)
+        return False
+
+
+def build_proxies(datapath, proxy_dir, sizes=proxy_sizes, fmt='jpeg', quality=90, n_workers=None):
+    """ make the missing or outdated proxies of every frame of the dataset in a process pool """
+    scan = scan_dataset(datapath, progress=print_progress)
+    video_ids = np.asarray(scan.video_ids, dtype=object)[scan.video_idx]
+    frame_ids = format_frame_ids(scan.frame_id_int, scan.frame_id_width)
+    extensions = np.asarray(scan.extensions, dtype=object)[scan.ext_idx]
+
+    jobs = []
+    for video_id, frame_id, ext in zip(video_ids, frame_ids, extensions):
+        relative_path = os.path.join(video_id, frame_id + '.' + ext)
+        src = os.path.join(datapath, relative_path)
+        for size in sizes:
+            jobs.append((src, proxy_path(proxy_dir, size, relative_path, fmt), size, fmt, quality))
+
+    n_written = 0
+    with Pool(n_workers) as pool:
+        for i, written in enumerate(pool.imap_unordered(_make_proxy_job, jobs, chunksize=64)):
+            n_written += written
+            if (i + 1) % 1000 == 0 or i + 1 == len(jobs):
+                print('INFO: {} / {} proxies checked, {} written'.format(i + 1, len(jobs), n_written))
+    return n_written
+
+
+class Proxy_Loader:
+    """ Frame_Prefetcher loader reading the smallest proxy that covers the display size.
+
+    The full resolution frame is used when the display is larger than every
+    proxy or, unless `lazy` is set, when the proxy has not been built. With
+    `lazy`, a missing proxy is made from the frame the first time it is needed.
+    `fallback(path, size)` loads the full resolution frames. """
+
+    def __init__(self, datapath, proxy_dir, sizes=proxy_sizes, fmt='jpeg', lazy=False, fallback=load_display_image):
+        self.datapath = datapath
+        self.fallback = fallback
+        self.proxy_dir = proxy_dir
+        self.sizes = sorted(sizes)
+        self.fmt = fmt
+        self.lazy = lazy
+
+    def select(self, path, size):
+        """ path of the proxy to display `path` at `size`, None if the frame itself has to be read """
+        needed = max(size)
+        fitting = [s for s in self.sizes if s >= needed]
+        if len(fitting) == 0:
+            return None
+
+        relative_path = os.path.relpath(path, self.datapath)
+        for s in fitting:
+            proxy = proxy_path(self.proxy_dir, s, relative_path, self.fmt)
+            if os.path.exists(proxy):
+                return proxy
+
+        if self.lazy:
+            proxy = proxy_path(self.proxy_dir, fitting[0], relative_path, self.fmt)
+            make_proxy(path, proxy, fitting[0], self.fmt)
+            return proxy
+        return None
+
+    def __call__(self, path, size):
+        proxy = self.select(path, size)
+        if proxy is None:
+            return self.fallback(path, size)
+        return load_display_image(proxy, size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build display-sized proxies of the frames')
+    parser.add_argument('--datapath', required=True, help='folder containing the frames organized in folders per video')
+    parser.add_argument('--proxy_dir', required=True, help='output folder')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(proxy_sizes), help='long side of the proxies')
+    parser.add_argument('--format', default='jpeg', choices=sorted(proxy_formats))
+    parser.add_argument('--quality', type=int, default=90)
+    parser.add_argument('--workers', type=int, default=None, help='processes, all the cpus by default')
+    args = parser.parse_args()
+
+    build_proxies(args.datapath, args.proxy_dir, args.sizes, args.format, args.quality, args.workers)
+
+
+if __name__ == '__main__':
+    main()
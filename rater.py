@@ -11,40 +11,22 @@ import tkinter as tk
 from tkinter import ttk 
 from tkinter import messagebox
 from PIL import Image, ImageTk, ImageOps
-import os, json
-from glob import glob1
+import os, json, time
 from subprocess import Popen
 from shutil import which
 from pathlib import Path
-import cv2
+from concurrent.futures import ThreadPoolExecutor
 
-from db_manager import DB_Manager
+from client import Remote_DB_Manager
+from frame_loader import get_resized_img, load_display_image
+from frame_cache import Frame_Prefetcher
+from video_index import Video_Index
+from clip_viewer import Clip_Decoder, Clip_Viewer
+from instrumentation import timings, timed
 
 logo1_path = './images/camma.png'
 logo2_path = './images/u_of_strasbourg_small.png'
 
-def get_resized_img(img, video_size):
-    """ resize image preserving aspect ratio
-    https://stackoverflow.com/a/54314043 """
-    width, height = video_size  # these are the MAX dimensions
-    video_ratio = width / height
-    img_ratio = img.size[0] / img.size[1]
-    if video_ratio >= 1:  # the video is wide
-        if img_ratio <= video_ratio:  # image is not wide enough
-            width_new = int(height * img_ratio)
-            size_new = width_new, height
-        else:  # image is wider than video
-            height_new = int(width / img_ratio)
-            size_new = width, height_new
-    else:  # the video is tall
-        if img_ratio >= video_ratio:  # image is not tall enough
-            height_new = int(width / img_ratio)
-            size_new = width, height_new
-        else:  # image is taller than video
-            width_new = int(height * img_ratio)
-            size_new = width_new, height
-    return img.resize(size_new, resample=Image.LANCZOS)
-
 def is_tool(name):
     """Check whether `name` is on PATH and marked as executable.
     https://stackoverflow.com/a/34177358 """
@@ -53,22 +35,117 @@ def is_tool(name):
 	
 class Reviewer_Gui_Rater(ttk.Frame):
     
-    def __init__(self, datapath, resource_dir, config_path):
+    def __init__(self, datapath, resource_dir, config_path, prefetch_count=3, start_time=None):
         super().__init__()   
-                    
-        self.dbm = DB_Manager(datapath,'annotations.pickle')
         
+        # time to the first interactive frame is measured from `start_time` (time.perf_counter)
+        self.start_time = time.perf_counter() if start_time is None else start_time
+                    
         self.logo1_path = os.path.join(resource_dir, 'camma.png')
         self.logo2_path = os.path.join(resource_dir, 'u_of_strasbourg_small.png')
         self.logo3_path = os.path.join(resource_dir, 'ihu.png')
         
         self.config_path = config_path
+        with open(self.config_path, 'r') as f:
+            self.config = json.load(f)
+        
+        # "instrumentation": true records the duration of the hot paths, see timingsKey
+        timings.enabled = self.config.get('instrumentation', False)
+        self.timings_overlay = None
+        
+        # the database and its history are loaded in the background while the window paints,
+        # the widgets reading them are filled in by on_database_ready
+        self.dbm = None
+        self.loader = None
+        self.prefetcher = None
+        self.prefetch_count = prefetch_count
+        # called once the first frame is shown, e.g. to bind the shortcuts
+        self.ready_callbacks = []
+        db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='database')
+        self.db_future = db_executor.submit(self.open_database, datapath)
+        db_executor.shutdown(wait=False)
+        
+        # the current frame at screen resolution, kept to re-render it when the window is resized
+        self.frame_path = None
+        self.frame_source = None
+        self.display_size = None
+        self.resize_pending = False
+        self.resize_job = None
+        
+        # metadata of the videos is indexed in the background for "Open video"
+        self.video_index = None
+        if 'videos_dir' in self.config:
+            self.open_video_index()
+        self.clip_decoder = Clip_Decoder()
         
         
         self.initUI()
         
         self.text_editing_mode = False
         
+        self.after(50, self.wait_for_database)
+        
+    def open_database(self, datapath):
+        """ (dbm, frame loader) of the configuration, run in a worker thread """
+        if 'server' in self.config:
+            # "server": "<host>:<port>" of server.py, the frames are downloaded already resized
+            host, port = self.config['server'].rsplit(':', 1)
+            # the disagreements are loaded by the server, see its --disagreements
+            dbm = Remote_DB_Manager(host, int(port))
+            return dbm, dbm.load_display_image
+        
+        # pandas and numpy are only imported here, after the window is shown
+        from db_manager import DB_Manager
+        from proxies import Proxy_Loader, proxy_sizes
+        from packs import Pack_Loader
+        
+        # "database": "<path>.sqlite" shares the annotations of several annotators in one database
+        dbm = DB_Manager(datapath, self.config.get('database', 'annotations.pickle'),
+                         annotator=self.config.get('annotator'))
+        if 'disagreements' in self.config:
+            # "disagreements": "<path>.csv" written by agreement.py, for the "only disagreements" mode
+            dbm.load_disagreements(self.config['disagreements'])
+        loader = load_display_image
+        if 'pack_dir' in self.config:
+            # frames packed per video by packs.py
+            loader = Pack_Loader(datapath, self.config['pack_dir'])
+        if 'proxy_dir' in self.config:
+            # display-sized copies of the frames made by proxies.py
+            loader = Proxy_Loader(datapath, self.config['proxy_dir'], self.config.get('proxy_sizes', proxy_sizes),
+                                  self.config.get('proxy_format', 'jpeg'), lazy=self.config.get('proxy_lazy', False),
+                                  fallback=loader)
+        return dbm, loader
+    
+    def wait_for_database(self):
+        if not self.db_future.done():
+            self.after(50, self.wait_for_database)
+            return
+        try:
+            dbm, loader = self.db_future.result()
+        except Exception as e:
+            print('ERROR: could not open the annotations ', e)
+            self.img_label.configure(text='Could not open the annotations: {}'.format(e))
+            return
+        self.on_database_ready(dbm, loader)
+        
+    def on_database_ready(self, dbm, loader):
+        self.dbm = dbm
+        self.loader = loader
+        # frames around the current one are decoded in the background
+        self.prefetcher = Frame_Prefetcher(loader)
+        
+        # the first frame is decoded once, at the size of the label
+        self.img_label.configure(text='')
+        for widget in self.db_widgets:
+            widget.configure(state='normal')
+        self.update_frame()
+        for callback in self.ready_callbacks:
+            callback()
+        
+        elapsed = time.perf_counter() - self.start_time
+        timings.record('gui.time_to_interactive', elapsed)
+        print('INFO: first frame interactive after {:.2f}s'.format(elapsed))
+        
     def on_focus_in(self, event):
         self.text_editing_mode = True
         
@@ -96,11 +173,9 @@ class Reviewer_Gui_Rater(ttk.Frame):
         vid_id_lbl = ttk.Label(goto_frame, text='video: ')
         vid_id_lbl.grid(row=0, column=0, sticky=tk.W+tk.N)
         
-        fr = self.dbm.get_id()
         self.vid_id_line = tk.StringVar()
         self.vid_id_entry = tk.Entry(goto_frame, width = 7, textvariable=self.vid_id_line)
         self.vid_id_entry.grid(row=0, column=1, sticky=tk.W)
-        self.vid_id_line.set(fr[0])
         self.vid_id_entry.bind("<FocusIn>", self.on_focus_in)
         self.vid_id_entry.bind("<FocusOut>", self.on_focus_out)
         
@@ -110,7 +185,6 @@ class Reviewer_Gui_Rater(ttk.Frame):
         self.frame_id_line = tk.StringVar()
         self.frame_id_entry = tk.Entry(goto_frame, width = 7, textvariable=self.frame_id_line)
         self.frame_id_entry.grid(row=0, column=3, sticky=tk.W+tk.N)
-        self.frame_id_line.set(fr[1])
         self.frame_id_entry.bind("<FocusIn>", self.on_focus_in)
         self.frame_id_entry.bind("<FocusOut>", self.on_focus_out)
         
@@ -124,11 +198,16 @@ class Reviewer_Gui_Rater(ttk.Frame):
         openVid_button =ttk.Button(vid_prog_frame, text="Open video", command=self.openVid_callback)
         openVid_button.grid(row=0, column=0, sticky=tk.N+tk.E)
         
+        clip_button =ttk.Button(vid_prog_frame, text="Context clip", command=self.clip_callback)
+        clip_button.grid(row=0, column=1, sticky=tk.N+tk.E)
+        
+        stats_button =ttk.Button(vid_prog_frame, text="Statistics", command=self.stats_callback)
+        stats_button.grid(row=0, column=2, sticky=tk.N+tk.E)
+        
         self.progress_line = tk.StringVar()
         progress_lbl = ttk.Label(vid_prog_frame, width=15, textvariable=self.progress_line )
-        progress_lbl.grid(row=0, column=1, sticky=tk.N+tk.E)
-        progress = self.dbm.get_progress()
-        self.progress_line.set('  {} / {}'.format(*progress))
+        progress_lbl.grid(row=0, column=3, sticky=tk.N+tk.E)
+        self.progress_line.set('  loading...')
         
         ######################################################
         frame_order = ttk.Frame(self, borderwidth=2)
@@ -151,27 +230,25 @@ class Reviewer_Gui_Rater(ttk.Frame):
         self.only_difficult_button = tk.Button(frame_order, text="Only Difficult", command=self.only_difficult_callback,width=15)
         self.only_difficult_button.grid(row=0, column=3, sticky=tk.E+tk.W+tk.N+tk.S)
         
+        self.only_disagreements_flag = False
+        self.only_disagreements_button = tk.Button(frame_order, text="Only Disagreements", command=self.only_disagreements_callback,width=18)
+        self.only_disagreements_button.grid(row=0, column=4, sticky=tk.E+tk.W+tk.N+tk.S)
+        
         about_button = tk.Button(self,text='About',command=self.about_callback)
         about_button.grid(row=0, column=width-1,sticky=tk.N+tk.E)
         
-        img_path = self.dbm.get_frame_path()
-        image_raw = Image.open(img_path)
-        img = ImageTk.PhotoImage(image_raw)
-        self.img_label = ttk.Label(self, image=img,borderwidth=0,compound="center") #,highlightthickness = 0
+        # black placeholder until the database is loaded
+        placeholder_size = (int(self.winfo_screenwidth() * 0.6), int(self.winfo_screenheight() * 0.6))
+        img = ImageTk.PhotoImage(Image.new('RGB', placeholder_size))
+        self.img_label = ttk.Label(self, image=img,borderwidth=0,compound="center",text='Loading annotations...',
+                                   foreground='white') #,highlightthickness = 0
         
         self.img_label.configure(image=img,anchor="center")
         self.img_label.image = img
         self.img_label.grid(row=2, column=0,columnspan=width, sticky=tk.N+tk.E+tk.W+tk.S,padx=0,pady=0)
-        # image_raw = ImageOps.fit(image_raw,new_size, Image.ANTIALIAS)
-        # print(new_size)
-        
-        img = ImageTk.PhotoImage(Image.open(img_path))#.resize(self.imsize))
-        ##
-        self.img_label = ttk.Label(self, image=img,borderwidth=0,compound="center") #,highlightthickness = 0
-        self.img_label.grid(row=2, column=0,columnspan=width, sticky=tk.N+tk.E+tk.W+tk.S,padx=0,pady=0)
-        self.img_label.image = img
         
         self.img_label.update()
+        self.img_label.bind('<Configure>', self.on_img_configure)
 
         
         
@@ -193,8 +270,6 @@ class Reviewer_Gui_Rater(ttk.Frame):
         comment_lbl.grid(row=0, column=0,sticky=tk.W)
         
         self.comment_line = tk.StringVar()
-        comment = self.dbm.get_comment()
-        self.comment_line.set(comment)
         self.comment_entry = tk.Entry(frame_comment, width = 35, textvariable=self.comment_line)
         self.comment_entry.grid(row=0, column=1,sticky=tk.W)
         
@@ -221,8 +296,6 @@ class Reviewer_Gui_Rater(ttk.Frame):
         self.anatomical_variationChk.grid(row=7, column = 0,sticky=tk.N)
         self.seenChk = ttk.Checkbutton(chk_frame, text='seen',width=21,command=self.clicked_seenChk)
         self.seenChk.grid(row=8, column = 0,sticky=tk.N)
-        self.read_flags()
-        self.show_label()
         
 #         ######################################################        
         # Navigataion panel
@@ -235,7 +308,20 @@ class Reviewer_Gui_Rater(ttk.Frame):
         self.next_button = ttk.Button(nav_frame, text="Next", command=self.next_callback)
         self.next_button.grid(row=0, column=1, columnspan=1,sticky=tk.E+tk.W+tk.N+tk.S,padx=2)
         
+        # disabled until the database is loaded
+        self.db_widgets = [goto_button, openVid_button, clip_button, stats_button, self.shffl_button, self.skip_seen_button,
+                           self.only_seen_button, self.only_difficult_button, self.only_disagreements_button, self.ok_button, self.prev_button,
+                           self.next_button, self.artifactChk, self.roi_not_seenChk, self.roi_visible_partiallyChk,
+                           self.instrChk, self.diffChk, self.oobChk, self.post_viewChk, self.anatomical_variationChk,
+                           self.seenChk] + self.entries
+        for widget in self.db_widgets:
+            widget.configure(state='disabled')
+        
+        # the logos are not needed for the first paint
+        self.after(20, self.load_logos)
         
+    def load_logos(self):
+        width = 6
         r = 0.8
         logo_img1 = ImageTk.PhotoImage(Image.open(self.logo1_path).resize([int(150*r), int(57*r)]))
         logo_label1 = tk.Label(self, image=logo_img1)
@@ -290,6 +376,16 @@ class Reviewer_Gui_Rater(ttk.Frame):
             
             self.only_difficult_button.config(text='Only Difficult')
         self.dbm.toggle_only_difficult(self.only_difficult_flag)
+    
+    def only_disagreements_callback(self):
+        if self.dbm.toggle_only_disagreements(not self.only_disagreements_flag):
+            self.only_disagreements_flag = True
+            self.only_disagreements_button.configure(text='_Only Disagreements_')
+        else:
+            if not self.only_disagreements_flag:
+                print('WARNING: no disagreements loaded, set "disagreements" in config.json to the csv written by agreement.py')
+            self.only_disagreements_flag = False
+            self.only_disagreements_button.config(text='Only Disagreements')
         
     def skip_seen_callback(self):
         if self.only_seen_flag:
@@ -309,20 +405,21 @@ class Reviewer_Gui_Rater(ttk.Frame):
         messagebox.showinfo(title="About",message="""This application was developed by Research Group CAMMA, University of Strasbourg (http://camma.u-strasbg.fr). \nThis code is available for non-commercial scientific research purposes as defined in the CC BY-NC-SA 4.0. By downloading and using this code you agree to the terms in the LICENSE. Third-party codes are subject to their respective licenses.""")
 
     
+    @timed('gui.update_frame')
     def update_frame(self):
         img_path = self.dbm.get_frame_path()
         
         # self.img_frame.update()
         new_size = [self.img_label.winfo_width(),self.img_label.winfo_height()]
-        image_raw = Image.open(img_path)
-        
-        image_raw = get_resized_img(image_raw, new_size)
+        image_raw = self.prefetcher.get(img_path, new_size)
         # image_raw = ImageOps.fit(image_raw,new_size, Image.ANTIALIAS)
         # print(new_size)
         
-        img = ImageTk.PhotoImage(image_raw)
-        self.img_label.configure(image=img,anchor="center")
-        self.img_label.image = img
+        if img_path != self.frame_path:
+            # decoded again only if the window is resized while this frame is shown
+            self.frame_path = img_path
+            self.frame_source = None
+        self.show_image(image_raw, new_size)
         
         fr = self.dbm.get_id()
         self.vid_id_line.set(str(fr[0]))
@@ -339,75 +436,193 @@ class Reviewer_Gui_Rater(ttk.Frame):
         
         self.show_label()
         
+        self.prefetcher.prefetch(self.dbm.peek_frame_paths(self.prefetch_count), new_size)
+        
+    def show_image(self, image, size):
+        img = ImageTk.PhotoImage(image)
+        self.img_label.configure(image=img,anchor="center")
+        self.img_label.image = img
+        self.display_size = tuple(size)
+        
+    def load_frame_source(self, path):
+        """ the frame (or its proxy) at most at screen resolution """
+        return self.loader(path, (self.winfo_screenwidth(), self.winfo_screenheight()))
+        
+    def on_img_configure(self, event):
+        if self.frame_path is None:
+            # still loading
+            return
+        if (event.width, event.height) == self.display_size or event.width < 2 or event.height < 2:
+            return
+        
+        # while the window is being resized, the frame is scaled from memory with a fast filter,
+        # at most once per idle loop
+        if not self.resize_pending:
+            self.resize_pending = True
+            self.after_idle(self.render_resized)
+        
+        # and with LANCZOS once the size has not changed for a moment
+        if self.resize_job is not None:
+            self.after_cancel(self.resize_job)
+        self.resize_job = self.after(200, self.render_settled)
+        
+    def resized_frame(self, size, resample):
+        if self.frame_source is None:
+            self.frame_source = self.load_frame_source(self.frame_path)
+        return get_resized_img(self.frame_source, size, resample=resample)
+        
+    def render_resized(self):
+        self.resize_pending = False
+        size = (self.img_label.winfo_width(), self.img_label.winfo_height())
+        self.show_image(self.resized_frame(size, Image.BILINEAR), size)
+        
+    def render_settled(self):
+        self.resize_job = None
+        size = (self.img_label.winfo_width(), self.img_label.winfo_height())
+        self.show_image(self.resized_frame(size, Image.LANCZOS), size)
+        # the neighbouring frames are needed at the new size now
+        self.prefetcher.prefetch(self.dbm.peek_frame_paths(self.prefetch_count), size)
+        
     def maybe_save_comment(self):
         comment = self.comment_entry.get()
         
         if comment != self.dbm.get_comment():
             self.dbm.set_comment(comment)
     
+    def on_close(self):
+        if self.dbm is None:
+            # closed while loading, the database is closed once it is open
+            try:
+                dbm, _ = self.db_future.result()
+                dbm.close()
+            except Exception as e:
+                print('ERROR: could not open the annotations ', e)
+            self.clip_decoder.shutdown()
+            self.master.destroy()
+            return
+        self.maybe_save_comment()
+        self.prefetcher.shutdown()
+        self.clip_decoder.shutdown()
+        if not self.dbm.close():
+            messagebox.showerror(title='Annotations not saved',
+                                 message='Some annotations could not be written to disk (full or read-only?), see the console.')
+        if timings.enabled:
+            self.dump_timings()
+        self.master.destroy()
+        
+    def dump_timings(self):
+        """ write the timings, with what they depend on, to "timings_log" (.json or .csv) """
+        path = self.config.get('timings_log', 'timings.json')
+        info = {
+            'n_frames': self.dbm.get_progress()[1],
+            'datapath': self.config.get('datapath'),
+            'database': self.config.get('database', 'annotations.pickle'),
+            'server': self.config.get('server'),
+            'loader': type(self.loader).__name__,
+            }
+        timings.dump(path, info)
+        print('INFO: timings written to ', path)
+        
+    def timingsKey(self, event):
+        """ show or hide the timings over the frame """
+        if self.timings_overlay is not None:
+            self.timings_overlay.destroy()
+            self.timings_overlay = None
+            return
+        if not timings.enabled:
+            print('INFO: set "instrumentation": true in config.json to record the timings')
+            return
+        
+        self.timings_overlay = tk.Label(self.img_label, justify=tk.LEFT, anchor=tk.NW, font='TkFixedFont',
+                                        bg='black', fg='white')
+        self.timings_overlay.place(x=5, y=5)
+        self.refresh_timings()
+        
+    def refresh_timings(self):
+        if self.timings_overlay is None:
+            return
+        lines = ['{:<24}{:>7}{:>9}{:>9}{:>9}'.format('ms', 'n', 'p50', 'p95', 'p99')]
+        for name, s in timings.summary().items():
+            lines.append('{:<24}{:>7}{:>9.1f}{:>9.1f}{:>9.1f}'.format(name, s['n'], s['p50'], s['p95'], s['p99']))
+        self.timings_overlay.configure(text='\n'.join(lines))
+        self.after(500, self.refresh_timings)
+    
     def goto_callback(self):
         self.maybe_save_comment()
         self.dbm.goto_frame(self.vid_id_entry.get(), self.frame_id_entry.get())
         self.update_frame()
         
-    def openVid_callback(self):
-
-        with open(self.config_path, 'r') as f:
-            info = json.load(f)
-            
-        if 'videos_dir' not in info:
+    def save_config(self):
+        with open(self.config_path, 'w') as f:    
+            json.dump(self.config, f)
+    
+    def open_video_index(self):
+        cache_path = os.path.join(os.path.dirname(os.path.abspath(self.config_path)), 'video_index.json')
+        self.video_index = Video_Index(self.config['videos_dir'], cache_path)
+        self.video_index.build_async()
+        
+    def get_video(self):
+        """ metadata of the video of the current frame, None if it can not be found """
+        if self.video_index is None:
             videos_dir = tk.filedialog.askdirectory(title='Select folder containing videos')
     
-            if len(videos_dir) != 0:
-                info['videos_dir'] = videos_dir
-                with open(self.config_path, 'w') as f:    
-                    json.dump(info, f)
-
-        videos_dir = info['videos_dir']
+            if len(videos_dir) == 0:
+                return None
+            self.config['videos_dir'] = videos_dir
+            self.save_config()
+            self.open_video_index()
         
-        fr = self.dbm.get_id()
-        vid_id = str(fr[0])
-        
-        found_vid = glob1(videos_dir, vid_id + '*')
+        vid_id = str(self.dbm.get_id()[0])
         
         try:
-            assert(len(found_vid) <= 1)
-        except:
-            print('Error: Multiple files found ', found_vid)
+            return self.video_index.lookup(vid_id)
+        except LookupError as e:
+            print('Error: ', e)
+            return None
+        
+    def clip_callback(self):
+        video = self.get_video()
+        if video is None:
             return -1
         
-        try:
-            assert(len(found_vid)==1)
-            vidpath = os.path.join(videos_dir, found_vid[0])
-            assert(os.path.exists(vidpath))
-        except:
-            print('File not found : ', os.path.join(videos_dir, vid_id+'*'))
+        vid_id, frame_id_int = self.dbm.get_id()
+        future = self.clip_decoder.request(video['path'], frame_id_int, video['fps'], frame_count=video['frame_count'])
+        Clip_Viewer(self.master, future, video['fps'], frame_id_int, 'Context: {} frame {}'.format(vid_id, frame_id_int))
+        
+    def stats_callback(self):
+        # numpy is only imported with the statistics, not at start-up
+        from stats_panel import Stats_Panel
+        Stats_Panel(self.master, self.dbm)
+        
+    def openVid_callback(self):
+        
+        video = self.get_video()
+        if video is None:
             return -1
         
+        fr = self.dbm.get_id()
+        
         vlc_path = ''
         if is_tool('vlc'):
             vlc_path = "vlc"
-        elif 'vlc_path' in info:
-            vlc_path = info['vlc_path']
+        elif 'vlc_path' in self.config:
+            vlc_path = self.config['vlc_path']
 			
         else:
             vlc_path = tk.filedialog.askopenfilename(title='Select path to VLC')
             if vlc_path != '':
-                info['vlc_path'] = vlc_path
-                with open(self.config_path, 'w') as f:    
-                    json.dump(info, f)
+                self.config['vlc_path'] = vlc_path
+                self.save_config()
         try:
             assert is_tool(vlc_path)
         except:
             print('ERROR: vlc not found {}'.format(vlc_path))
             return
         
-        vidpath = str(Path(vidpath))
+        vidpath = str(Path(video['path']))
         vlc_path = str(Path(vlc_path))
         
-        
-        cam = cv2.VideoCapture(vidpath)
-        fps = cam.get(cv2.CAP_PROP_FPS)
+        fps = video['fps']
         
         seconds = int(fr[1] / fps)
         print(fps)
@@ -547,10 +762,10 @@ class Reviewer_Gui_Rater(ttk.Frame):
     def ok_callback(self):
 
         new_labels = [int(chk.instate(['selected'])) for chk in self.entries]
-        self.dbm.set_labels(new_labels)
+        # labels and seen flag are saved as one edit
+        self.dbm.set_labels(new_labels, seen=1)
         
         self.seenChk.state(['!disabled','selected'])
-        self.clicked_seenChk()
         
     def leftKey(self, event):
         if not self.text_editing_mode:
@@ -581,6 +796,26 @@ class Reviewer_Gui_Rater(ttk.Frame):
         self.ok_button.invoke()
         self.ok_button.after(100, lambda : self.ok_button.state(['!pressed']))
         
+    def ctrl_kKey(self, event):
+        self.clip_callback()
+        
+    def statsKey(self, event):
+        self.stats_callback()
+        
+    def undoKey(self, event):
+        if self.text_editing_mode:
+            return
+        self.maybe_save_comment()
+        if self.dbm.undo():
+            self.update_frame()
+            
+    def redoKey(self, event):
+        if self.text_editing_mode:
+            return
+        self.maybe_save_comment()
+        if self.dbm.redo():
+            self.update_frame()
+        
     def oneKey(self, event):
         self.toggleCheckbox(self.entries[0])
         
@@ -632,3 +867,6 @@ class Reviewer_Gui_Rater(ttk.Frame):
     # <Control+o>'  : Toggle out of body
     # <Control+p>'  : Toggle posterior view
     # <Control+v>'  : Toggle anatomical variation
+    # <Control+k>'  : Play the video around the current frame
+    # <Control+z>'  : Undo last change
+    # <Control+y>'  : Redo last undone change
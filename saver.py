@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import threading
+import time
+
+
+class Background_Saver:
+    """ Writer thread persisting the edits of DB_Manager.
+
+    Edits are applied in memory by the caller and only queued here. The writer
+    waits up to `delay` seconds after the first queued edit to collect a batch,
+    merges the journal records of the same row, then appends the batch to the
+    history and the journal with a single fsync. An edit is therefore on disk at
+    most `delay` seconds after it was made; the batch is written at once when
+    `max_pending` edits are queued or when a flush is requested. After a write
+    error the batch is retried, without the history deltas already written, up
+    to `max_retries` times; it is then given up and `error` is set, e.g. when
+    the disk is full or read-only. """
+
+    def __init__(self, journal, history, on_written=None, delay=0.5, max_pending=100, max_retries=10, timeout=30):
+        self.journal = journal
+        self.history = history
+        self.on_written = on_written
+        self.delay = delay
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.timeout = timeout
+        # last write error, the edits given up are counted in n_lost
+        self.error = None
+        self.n_lost = 0
+
+        self._cond = threading.Condition()
+        self._pending = []
+        self._flush_now = False
+        self._closed = False
+        self._n_submitted = 0
+        self._n_written = 0
+
+        self._thread = threading.Thread(target=self._run, name='saver', daemon=True)
+        self._thread.start()
+
+    def submit(self, row, values, delta):
+        """ queue the journal record and history delta of one edit, never blocks on disk """
+        with self._cond:
+            # the last item tells whether the history delta is written
+            self._pending.append([row, values, delta, False])
+            self._n_submitted += 1
+            self._cond.notify()
+
+    def request_flush(self):
+        """ write the queued edits now, without waiting for them """
+        with self._cond:
+            if self._pending:
+                self._flush_now = True
+                self._cond.notify()
+
+    def flush(self, timeout=None):
+        """ wait, at most `timeout` seconds (self.timeout by default), until every edit
+        submitted so far is written. Returns False if some edits are not on disk """
+        if timeout is None:
+            timeout = self.timeout
+        with self._cond:
+            target = self._n_submitted
+            self._flush_now = True
+            self._cond.notify()
+            done = self._cond.wait_for(lambda: self._n_written + self.n_lost >= target or not self._thread.is_alive(), timeout)
+            return done and self._thread.is_alive() and self.n_lost == 0
+
+    def close(self, timeout=None):
+        """ write the queued edits and stop the writer. Returns False if some edits are
+        not on disk """
+        saved = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(self.timeout if timeout is None else timeout)
+        return saved
+
+    def _run(self):
+        n_failures = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed and not self._pending:
+                    return
+
+                deadline = time.monotonic() + self.delay
+                while not (self._flush_now or self._closed or len(self._pending) >= self.max_pending):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+                batch = self._pending
+                self._pending = []
+                self._flush_now = False
+
+            try:
+                self._write(batch)
+            except Exception as e:
+                n_failures += 1
+                with self._cond:
+                    self.error = e
+                    if n_failures <= self.max_retries:
+                        print('ERROR: could not save the annotations, retrying ', e)
+                        self._pending[:0] = batch
+                    else:
+                        print('ERROR: could not save the annotations, {} edits are only in memory '.format(len(batch)), e)
+                        self.n_lost += len(batch)
+                        n_failures = 0
+                        self._cond.notify_all()
+                time.sleep(self.delay)
+                continue
+
+            n_failures = 0
+            with self._cond:
+                self._n_written += len(batch)
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        # the journal records only set values, so the edits of a row can be merged
+        records = {}
+        for row, values, _, _ in batch:
+            records.setdefault(row, {}).update(values)
+
+        # the journal records can be written twice, the history deltas cannot
+        unwritten = [edit for edit in batch if not edit[3]]
+        if unwritten:
+            self.history.write([delta for _, _, delta, _ in unwritten])
+            for edit in unwritten:
+                edit[3] = True
+        self.journal.append_many(list(records.items()))
+
+        if self.on_written is not None:
+            self.on_written()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+frame_extensions = ('png', 'jpg', 'jpeg')
+
+
+class Scan_Result:
+    """ Frames found in a dataset as typed arrays, sorted by video and frame id.
+
+    video_ids       sorted names of the video folders
+    video_idx       int32 index in video_ids of the video of each frame
+    frame_id_int    int32 frame id
+    frame_id_width  uint8 length of the frame file name without extension
+    ext_idx         uint8 index in extensions of the file extension of each frame
+    extensions      file extensions found in the dataset, as written on disk """
+
+    def __init__(self, video_ids, video_idx, frame_id_int, frame_id_width, ext_idx, extensions):
+        self.video_ids = video_ids
+        self.video_idx = video_idx
+        self.frame_id_int = frame_id_int
+        self.frame_id_width = frame_id_width
+        self.ext_idx = ext_idx
+        self.extensions = extensions
+
+    def __len__(self):
+        return len(self.frame_id_int)
+
+
+def print_progress(done, total):
+    if done == total or done % max(1, total // 20) == 0:
+        print('INFO: scanned {} / {} video folders'.format(done, total))
+
+
+def list_video_dirs(datapath):
+    """ names of the video folders of a dataset, sorted """
+    with os.scandir(datapath) as it:
+        return sorted(entry.name for entry in it if entry.is_dir() and not entry.name.startswith('.'))
+
+
+def scan_video_dir(path):
+    """ frames of one video folder. Returns (frame ids, name lengths, extensions) sorted by frame id """
+    frame_ids, widths, exts = [], [], []
+    with os.scandir(path) as it:
+        for entry in it:
+            stem, dot, ext = entry.name.rpartition('.')
+            if not dot or ext.lower() not in frame_extensions:
+                continue
+            try:
+                frame_id_int = int(stem)
+            except ValueError:
+                print('WARNING: skipping frame with a non numeric name ', os.path.join(path, entry.name))
+                continue
+            frame_ids.append(frame_id_int)
+            widths.append(len(stem))
+            exts.append(ext)
+
+    frame_ids = np.array(frame_ids, dtype=np.int32)
+    order = np.argsort(frame_ids, kind='stable')
+    return frame_ids[order], np.array(widths, dtype=np.uint8)[order], [exts[i] for i in order]
+
+
+def scan_dataset(datapath, video_dirs=None, n_workers=16, progress=None):
+    """ list the frames of every video folder of `datapath` (or only of `video_dirs`)
+    with one os.scandir per folder, in a thread pool """
+    if video_dirs is None:
+        video_dirs = list_video_dirs(datapath)
+    video_dirs = sorted(video_dirs)
+
+    results = [None] * len(video_dirs)
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(scan_video_dir, os.path.join(datapath, v)): i for i, v in enumerate(video_dirs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(video_dirs))
+
+    extensions = []
+    ext_codes = {}
+    video_idx, frame_id_int, frame_id_width, ext_idx = [], [], [], []
+    for i, (frame_ids, widths, exts) in enumerate(results):
+        for ext in exts:
+            if ext not in ext_codes:
+                ext_codes[ext] = len(extensions)
+                extensions.append(ext)
+        video_idx.append(np.full(len(frame_ids), i, dtype=np.int32))
+        frame_id_int.append(frame_ids)
+        frame_id_width.append(widths)
+        ext_idx.append(np.array([ext_codes[e] for e in exts], dtype=np.uint8))
+
+    def concat(arrays, dtype):
+        return np.concatenate(arrays).astype(dtype) if arrays else np.zeros(0, dtype=dtype)
+
+    return Scan_Result(video_dirs, concat(video_idx, np.int32), concat(frame_id_int, np.int32),
+                       concat(frame_id_width, np.uint8), concat(ext_idx, np.uint8), extensions)
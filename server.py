@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+
+Headless annotation server: serves the DB_Manager operations and the frames,
+resized and encoded as jpeg, over HTTP/1.1 with keep-alive connections.
+
+    python server.py --datapath <frames> [--annotations annotations.pickle] [--port 8765]
+
+and set "server": "<host>:<port>" in the config.json of the annotation tool.
+"""
+
+import argparse
+import asyncio
+import json
+import signal
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from db_manager import DB_Manager
+from client import remote_methods
+from frame_cache import Frame_Cache
+from frame_loader import encode_display_image, load_display_image
+from proxies import Proxy_Loader
+from packs import Pack_Loader
+from journal import _json_default
+
+reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+class Annotation_Server:
+    """ HTTP front end of a DB_Manager.
+
+        GET  /state                 current frame, its annotations and the progress
+        POST /call                  {"method": <name>, "args": [...], "id": <n>}, returns {"result", "state"}
+        GET  /frame/<row>?w=&h=     the frame resized to fit w x h, as jpeg
+
+    Every client sends its session id in an X-Session header: the current frame,
+    the filters and the undo stack are kept per session, the annotations are
+    shared. A call sent again with the same id (a retry after a lost response)
+    returns the first reply instead of being applied twice.
+
+    DB_Manager calls run one at a time on the event loop, they only touch memory.
+    Frames are decoded and encoded in a thread pool and the jpegs are cached. """
+
+    def __init__(self, dbm, n_workers=4, max_bytes=256 * 2**20, quality=85, loader=load_display_image):
+        self.dbm = dbm
+        self.quality = quality
+        self.loader = loader
+        self.cache = Frame_Cache(max_bytes)
+        self.executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix='encoder')
+        self._connections = {}
+        # session id: (DB_Manager session, replies of the last calls by id)
+        self.sessions = {}
+        self.max_replies = 64
+
+    def get_state(self):
+        frame = self.dbm.get_frame()
+        return {
+            'row': int(self.dbm.get_row()),
+            'id': list(self.dbm.get_id()),
+            'progress': list(self.dbm.get_progress()),
+            'frame': frame,
+            }
+
+    async def get_frame_image(self, row, size):
+        key = (row, size)
+        data = self.cache.get(key)
+        if data is None:
+            path = self.dbm.get_frame_path(row)
+            loop = asyncio.get_running_loop()
+            data = await loop.run_in_executor(self.executor, encode_display_image, path, size, self.quality, self.loader)
+            self.cache.put(key, data)
+        return data
+
+    def call(self, session_id, request):
+        """ reply of a DB_Manager call in the session of the client, an empty request
+        only gives the state """
+        if session_id not in self.sessions:
+            self.sessions[session_id] = (self.dbm.new_session(), OrderedDict())
+        session, replies = self.sessions[session_id]
+
+        call_id = request.get('id')
+        if call_id is not None and call_id in replies:
+            return replies[call_id]
+
+        self.dbm.set_session(session)
+        try:
+            result = None
+            if 'method' in request:
+                result = getattr(self.dbm, request['method'])(*request.get('args', []))
+            reply = {'result': result, 'state': self.get_state()}
+        finally:
+            self.sessions[session_id] = (self.dbm.get_session(), replies)
+
+        if call_id is not None:
+            replies[call_id] = reply
+            if len(replies) > self.max_replies:
+                replies.popitem(last=False)
+        return reply
+
+    async def dispatch(self, method, target, body, session_id=''):
+        """ (status, content type, payload) of a request """
+        url = urlsplit(target)
+
+        if method == 'GET' and url.path == '/state':
+            return 200, 'application/json', self.call(session_id, {})['state']
+
+        if method == 'POST' and url.path == '/call':
+            request = json.loads(body)
+            if request.get('method') not in remote_methods:
+                return 404, 'text/plain', 'unknown method {}'.format(request.get('method'))
+            return 200, 'application/json', self.call(session_id, request)
+
+        if method == 'GET' and url.path.startswith('/frame/'):
+            row = int(url.path[len('/frame/'):])
+            if not 0 <= row < self.dbm.n_frames:
+                return 404, 'text/plain', 'no frame {}'.format(row)
+            query = parse_qs(url.query)
+            size = (int(query.get('w', ['640'])[0]), int(query.get('h', ['480'])[0]))
+            return 200, 'image/jpeg', await self.get_frame_image(row, size)
+
+        return 404, 'text/plain', 'not found'
+
+    async def handle(self, reader, writer):
+        """ serve the requests of one connection until the client closes it """
+        self._connections[asyncio.current_task()] = writer
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, value = line.decode('latin-1').split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                try:
+                    status, content_type, payload = await self.dispatch(method, target, body, headers.get('x-session', ''))
+                except Exception as e:
+                    print('ERROR: ', method, target, e)
+                    status, content_type, payload = 500, 'text/plain', str(e)
+
+                if content_type == 'application/json':
+                    payload = json.dumps(payload, default=_json_default)
+                if isinstance(payload, str):
+                    payload = payload.encode('utf-8')
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                head = 'HTTP/1.1 {} {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+                    status, reasons[status], content_type, len(payload), 'keep-alive' if keep_alive else 'close')
+                writer.write(head.encode('latin-1') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            self._connections.pop(asyncio.current_task(), None)
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print('INFO: serving annotations on {}:{}'.format(host, port))
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                # windows
+                pass
+
+        async with server:
+            await stop.wait()
+
+            # idle keep-alive connections see the end of their stream and return
+            for writer in list(self._connections.values()):
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.dbm.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the annotations of a dataset over HTTP')
+    parser.add_argument('--datapath', required=True, help='folder containing the frames organized in folders per video')
+    parser.add_argument('--annotations', default='annotations.pickle', help='annotation path, a .sqlite path for a shared database')
+    parser.add_argument('--annotator', default=None, help='annotator name in a shared database')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=4, help='threads encoding the frames')
+    parser.add_argument('--pack_dir', default=None, help='frames packed per video by packs.py')
+    parser.add_argument('--proxy_dir', default=None, help='proxies of the frames built by proxies.py')
+    parser.add_argument('--lazy_proxies', action='store_true', help='make the missing proxies when they are first needed')
+    parser.add_argument('--disagreements', default=None, help='csv written by agreement.py, for the "only disagreements" mode')
+    args = parser.parse_args()
+
+    loader = load_display_image
+    if args.pack_dir is not None:
+        loader = Pack_Loader(args.datapath, args.pack_dir)
+    if args.proxy_dir is not None:
+        loader = Proxy_Loader(args.datapath, args.proxy_dir, lazy=args.lazy_proxies, fallback=loader)
+
+    dbm = DB_Manager(args.datapath, args.annotations, annotator=args.annotator)
+    if args.disagreements is not None:
+        dbm.load_disagreements(args.disagreements)
+    server = Annotation_Server(dbm, n_workers=args.workers, loader=loader)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from annotation_store import Annotation_Store, flag_bits, status_bits, UNKNOWN_EXT
+from history import History_Store
+from journal import _json_default
+from dataset_sync import stat_video_dirs
+from scanner import scan_dataset
+
+# annotation paths with these extensions are opened with the sqlite backend
+sqlite_extensions = ('.sqlite', '.sqlite3', '.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    frame_id TEXT NOT NULL,
+    frame_id_int INTEGER NOT NULL,
+    ext TEXT,
+    missing INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (video_id, frame_id_int)
+);
+CREATE TABLE IF NOT EXISTS labels (
+    frame INTEGER NOT NULL REFERENCES frames (id),
+    annotator TEXT NOT NULL,
+    flags INTEGER NOT NULL DEFAULT 0,
+    comment TEXT NOT NULL DEFAULT '',
+    modified REAL NOT NULL,
+    PRIMARY KEY (frame, annotator)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS labels_annotator ON labels (annotator, frame);
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    annotator TEXT NOT NULL,
+    op TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    frame_id_int INTEGER NOT NULL,
+    changes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_annotator ON history (annotator, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+UPSERT_LABELS = """
+INSERT INTO labels (frame, annotator, flags, comment, modified)
+VALUES (:frame, :annotator, :set, COALESCE(:comment, ''), :modified)
+ON CONFLICT (frame, annotator) DO UPDATE SET
+    flags = (flags & ~:clear) | :set,
+    comment = COALESCE(:comment, comment),
+    modified = :modified
+"""
+
+UPSERT_FRAME = """
+INSERT INTO frames (video_id, frame_id, frame_id_int, ext, missing) VALUES (?, ?, ?, ?, 0)
+ON CONFLICT (video_id, frame_id_int) DO UPDATE SET missing = 0, ext = excluded.ext, frame_id = excluded.frame_id
+"""
+
+
+def connect(path):
+    """ connection to a shared annotation database in WAL mode """
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    # readers never block the writer and the writer does not block the readers, commits
+    # only append to the -wal file instead of rewriting the database
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class Sqlite_Store(Annotation_Store):
+    """ Annotations of one annotator in a SQLite database shared by several annotators.
+
+    The database holds the frames of the dataset, the labels of every annotator
+    (one row per frame and annotator, only for the frames they edited) and the
+    history of the edits. The frames and the labels of `annotator` are loaded in
+    the same in-memory columns as Annotation_Store, rows being ordered by video
+    and frame id; writes go through write_labels(), one transaction per batch. """
+
+    def __init__(self, path, annotator):
+        self.path = path
+        self.annotator = annotator
+        self.conn = connect(path)
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """ read the frames and the labels of the annotator """
+        with self._lock:
+            frames = self.conn.execute('SELECT id, video_id, frame_id, frame_id_int, ext, missing FROM frames '
+                                       'ORDER BY video_id, frame_id_int').fetchall()
+            labels = self.conn.execute('SELECT frame, flags, comment FROM labels WHERE annotator = ?',
+                                       (self.annotator,)).fetchall()
+
+        self.n_frames = len(frames)
+        frame_pk, video_id, frame_id, frame_id_int, ext, missing = zip(*frames) if frames else ([],) * 6
+
+        self.frame_pk = np.array(frame_pk, dtype=np.int64)
+        self.video_ids, self.video_idx = np.unique(np.array(video_id, dtype=object).astype(str), return_inverse=True)
+        self.video_ids = self.video_ids.tolist()
+        self.video_idx = self.video_idx.astype(np.int32)
+        self.frame_id_int = np.array(frame_id_int, dtype=np.int32)
+        self.frame_id_width = np.array([len(f) for f in frame_id], dtype=np.uint8)
+
+        self.extensions = sorted(set(e for e in ext if e is not None))
+        ext_codes = {e: i for i, e in enumerate(self.extensions)}
+        self.ext_idx = np.array([ext_codes.get(e, UNKNOWN_EXT) for e in ext], dtype=np.uint8)
+
+        self.flags = np.array(missing, dtype=np.uint16) << status_bits['missing']
+        self.comments = {}
+
+        row_of = {pk: row for row, pk in enumerate(frame_pk)}
+        for pk, flags, comment in labels:
+            row = row_of.get(pk)
+            if row is None:
+                continue
+            self.flags[row] |= np.uint16(flags)
+            if comment:
+                self.comments[row] = comment
+
+    def write_labels(self, records):
+        """ save (row, values) records of the annotator in a single transaction """
+        params = []
+        now = time.time()
+        for row, values in records:
+            clear = 0
+            set_bits = 0
+            for field_name, value in values.items():
+                if field_name in flag_bits:
+                    clear |= 1 << flag_bits[field_name]
+                    if value:
+                        set_bits |= 1 << flag_bits[field_name]
+            params.append({'frame': int(self.frame_pk[row]), 'annotator': self.annotator, 'clear': clear,
+                           'set': set_bits, 'comment': values.get('comment'), 'modified': now})
+
+        with self._lock, self.conn:
+            self.conn.executemany(UPSERT_LABELS, params)
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            value = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return default if value is None else json.loads(value[0])
+
+    def sync(self, datapath, progress=None):
+        """ add the new frames of `datapath` and mark the missing ones, same rules as
+        dataset_sync.sync_store. Returns the store and the number of added and missing frames """
+        dirs = stat_video_dirs(datapath)
+        manifest = self.get_meta('scan_manifest', {})
+
+        changed = [v for v in dirs if manifest.get(v) != dirs[v]]
+        removed = [v for v in self.video_ids if v not in dirs]
+
+        n_before = self.n_frames
+        n_missing_before = int(np.count_nonzero(self.column('missing')))
+
+        scan = scan_dataset(datapath, video_dirs=changed, progress=progress) if changed else None
+
+        with self._lock, self.conn:
+            # frames of the rescanned folders that are not found again stay marked as missing
+            for video_id in removed + changed:
+                self.conn.execute('UPDATE frames SET missing = 1 WHERE video_id = ?', (video_id,))
+
+            for i, video_id in enumerate(scan.video_ids if scan is not None else []):
+                sel = np.flatnonzero(scan.video_idx == i)
+                self.conn.executemany(UPSERT_FRAME, [
+                    (video_id, str(scan.frame_id_int[r]).zfill(int(scan.frame_id_width[r])), int(scan.frame_id_int[r]),
+                     scan.extensions[scan.ext_idx[r]]) for r in sel.tolist()])
+
+            self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                              ('scan_manifest', json.dumps(dirs)))
+
+        if changed or removed:
+            self.load()
+
+        n_added = self.n_frames - n_before
+        n_missing = int(np.count_nonzero(self.column('missing')))
+        if n_added > 0 or n_missing != n_missing_before:
+            print('INFO: dataset sync, {} frames added, {} frames missing'.format(n_added, n_missing))
+        return self, n_added, n_missing
+
+    def encode_extensions(self, extensions):
+        """ ext_idx codes of file extensions. The frames table stores the extensions
+        themselves, so new ones are only added to the table in memory """
+        codes = []
+        for ext in extensions:
+            if ext not in self.extensions:
+                assert len(self.extensions) < UNKNOWN_EXT
+                self.extensions.append(ext)
+            codes.append(self.extensions.index(ext))
+        return np.array(codes, dtype=np.uint8)
+
+    def flush(self):
+        """ every write is committed, nothing is buffered """
+        pass
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class Sqlite_Journal:
+    """ Change_Journal interface over a Sqlite_Store: edits are written straight
+    to the labels table, so there is never anything to replay or truncate """
+
+    def __init__(self, store):
+        self.store = store
+        self.path = store.path
+        self.n_records = 0
+        self.torn = False
+
+    def replay(self):
+        return iter(())
+
+    def append(self, row, values):
+        self.append_many([(row, values)])
+
+    def append_many(self, records):
+        self.store.write_labels(records)
+
+    def truncate(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class Sqlite_History:
+    """ History_Store interface over the history table of a Sqlite_Store """
+
+    make_delta = staticmethod(History_Store.make_delta)
+
+    def __init__(self, store):
+        self.store = store
+
+    def append(self, row, video_id, frame_id_int, changes, op='edit'):
+        self.write([self.make_delta(row, video_id, frame_id_int, changes, op)])
+
+    def write(self, deltas):
+        params = [(d['time'], self.store.annotator, d['op'], d['video_id'], d['frame_id_int'],
+                   json.dumps(d['changes'], default=_json_default)) for d in deltas]
+        with self.store._lock, self.store.conn:
+            self.store.conn.executemany('INSERT INTO history (time, annotator, op, video_id, frame_id_int, changes) '
+                                        'VALUES (?, ?, ?, ?, ?, ?)', params)
+
+    def iter_deltas(self):
+        """ yields the deltas of the annotator, oldest first """
+        with self.store._lock:
+            records = self.store.conn.execute('SELECT time, op, video_id, frame_id_int, changes FROM history '
+                                              'WHERE annotator = ? ORDER BY id', (self.store.annotator,)).fetchall()
+        for t, op, video_id, frame_id_int, changes in records:
+            yield {'time': t, 'op': op, 'row': None, 'video_id': video_id, 'frame_id_int': frame_id_int,
+                   'changes': json.loads(changes)}
+
+    def close(self):
+        pass
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+from annotation_stats import format_summary
+
+# (heading, value of a video summary) of the columns of the table
+video_columns = [
+    ('frames', lambda s: s['frames']),
+    ('seen', lambda s: '{:.1%}'.format(s['seen_rate'])),
+    ('C1', lambda s: s['seen_counts']['cvs_cri_1']),
+    ('C2', lambda s: s['seen_counts']['cvs_cri_2']),
+    ('C3', lambda s: s['seen_counts']['cvs_cri_3']),
+    ('CVS', lambda s: s['criteria_met'][3]),
+    ('out-of-body', lambda s: '{:.1%}'.format(s['out_of_body_rate'])),
+    ('difficult', lambda s: '{:.1%}'.format(s['difficult_rate'])),
+    ]
+
+
+class Stats_Panel(tk.Toplevel):
+    """ Window showing the progress of the annotation, for the dataset and per video.
+    The counts are kept up to date by the DB_Manager, they are read every `interval` ms """
+
+    def __init__(self, master, dbm, interval=1000):
+        super().__init__(master)
+        self.title('Statistics')
+
+        self.dbm = dbm
+        self.interval = interval
+        self._after_id = None
+
+        self.summary_line = tk.StringVar()
+        summary_lbl = ttk.Label(self, textvariable=self.summary_line, font='TkFixedFont', justify=tk.LEFT)
+        summary_lbl.grid(row=0, column=0, sticky=tk.W, padx=10, pady=10)
+
+        headings = [c for c, _ in video_columns]
+        self.table = ttk.Treeview(self, columns=headings, height=15)
+        self.table.heading('#0', text='video')
+        self.table.column('#0', width=120)
+        for heading in headings:
+            self.table.heading(heading, text=heading)
+            self.table.column(heading, width=80, anchor=tk.E)
+        self.table.grid(row=1, column=0, sticky=tk.N+tk.E+tk.W+tk.S, padx=10)
+
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.table.yview)
+        scrollbar.grid(row=1, column=1, sticky=tk.N+tk.S)
+        self.table.configure(yscrollcommand=scrollbar.set)
+
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.refresh()
+
+    def destroy(self):
+        # the command of a pending refresh is deleted with the window
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        super().destroy()
+
+    def refresh(self):
+        summary = self.dbm.get_stats()
+        self.summary_line.set('\n'.join(format_summary(summary)))
+
+        for video_id, video_summary in summary['videos'].items():
+            values = [value(video_summary) for _, value in video_columns]
+            if self.table.exists(video_id):
+                self.table.item(video_id, values=values)
+            else:
+                self.table.insert('', tk.END, iid=video_id, text=video_id, values=values)
+
+        self._after_id = self.after(self.interval, self.refresh)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+# the modules of the tool are at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """ folder of 2 videos of 10 small png frames each, frame ids 0, 25, 50, ... """
+    datapath = tmp_path / 'data'
+    for video_id in ('video01', 'video02'):
+        os.makedirs(datapath / video_id)
+        for i in range(10):
+            Image.new('RGB', (8, 6), (i * 20, 0, 0)).save(datapath / video_id / '{:05d}.png'.format(i * 25))
+    return str(datapath)
+
+
+@pytest.fixture
+def legacy_annotations(dataset, tmp_path):
+    """ annotations.pickle of the dataset in the former format, a DataFrame of one row per frame """
+    rows = [(v, '{:05d}'.format(i * 25), i * 25) for v in ('video01', 'video02') for i in range(10)]
+    df = pd.DataFrame(rows, columns=['video_id', 'frame_id', 'frame_id_int'])
+    for field_name in ['instr_in_roi', 'difficult', 'out_of_body', 'seen', 'post_view', 'cvs_cri_1', 'cvs_cri_2',
+                       'cvs_cri_3', 'anatomical_variation', 'roi_not_seen', 'artifact', 'roi_visible_partially']:
+        df[field_name] = 0
+    df['comment'] = ''
+    path = str(tmp_path / 'annotations.pickle')
+    df.to_pickle(path)
+    return path
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import numpy as np
+import pandas as pd
+
+from agreement import cohen_kappa, compute_agreement, confusion_matrices, find_disagreements, fleiss_kappa
+from annotation_store import flag_fields
+from merge import Aligned_Annotations
+
+
+def test_confusion_matrices():
+    a = np.array([[1, 0], [1, 1], [0, 0], [0, -1]])
+    b = np.array([[1, 1], [0, 1], [0, 0], [1, 0]])
+    confusion = confusion_matrices(a, b)
+    assert confusion[0].tolist() == [[1, 1], [1, 1]]
+    # the last frame is left out of the second field
+    assert confusion[1].tolist() == [[1, 1], [0, 1]]
+
+
+def test_cohen_kappa():
+    # observed agreement 0.7, chance agreement 0.5
+    assert np.isclose(cohen_kappa([[20, 5], [10, 15]]), 0.4)
+    assert np.isclose(cohen_kappa([[3, 0], [0, 7]]), 1)
+    # a flag nobody sets
+    assert np.isnan(cohen_kappa([[10, 0], [0, 0]]))
+
+
+def test_fleiss_kappa_of_two_raters_is_scotts_pi():
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 2, 500)
+    b = np.where(rng.random(500) < 0.8, a, 1 - a)
+    observed = (a == b).mean()
+    p = (a.mean() + b.mean()) / 2
+    expected = p ** 2 + (1 - p) ** 2
+    kappa = fleiss_kappa(np.stack([a, b])[:, :, None])
+    assert np.isclose(kappa[0], (observed - expected) / (1 - expected))
+
+
+def test_fleiss_kappa():
+    # 3 raters, 4 frames
+    values = np.array([[1, 1, 0, 0], [1, 1, 0, 1], [1, 0, 0, 1]])[:, :, None]
+    # per frame agreement 1, 1/3, 1, 1/3 and p(1) = 7/12
+    observed = (1 + 1 / 3 + 1 + 1 / 3) / 4
+    expected = (7 / 12) ** 2 + (5 / 12) ** 2
+    assert np.isclose(fleiss_kappa(values)[0], (observed - expected) / (1 - expected))
+
+
+def annotations(seen, cvs_cri_1):
+    df = pd.DataFrame({'video_id': 'video01', 'frame_id_int': np.arange(len(seen)) * 25})
+    for field_name in flag_fields:
+        df[field_name] = 0
+    df['seen'] = seen
+    df['cvs_cri_1'] = cvs_cri_1
+    return df
+
+
+def test_agreement_over_the_seen_frames():
+    alice = annotations(seen=[1, 1, 1, 1, 0], cvs_cri_1=[1, 0, 1, 0, 1])
+    bob = annotations(seen=[1, 1, 1, 0, 1], cvs_cri_1=[1, 0, 0, 1, 0])
+    aligned = Aligned_Annotations([alice, bob])
+    result = compute_agreement(aligned, ['alice', 'bob'], ['cvs_cri_1', 'difficult'])
+
+    pair = result['pairs'][0]
+    assert pair['raters'] == ['alice', 'bob']
+    assert pair['n_frames'] == 3
+    assert pair['confusion']['cvs_cri_1'] == [[1, 0], [1, 1]]
+    assert np.isclose(pair['cohen']['cvs_cri_1'], cohen_kappa([[1, 0], [1, 1]]))
+    assert pair['cohen']['difficult'] is None
+    assert result['fleiss']['n_frames'] == 3
+
+    disagreements = find_disagreements(aligned, ['alice', 'bob'], ['cvs_cri_1', 'difficult'])
+    assert disagreements['frame_id_int'].tolist() == [50]
+    assert disagreements['fields'].tolist() == ['cvs_cri_1']
+    assert disagreements['alice'].tolist() == ['cvs_cri_1']
+    assert disagreements['bob'].tolist() == ['']
+
+
+def test_only_disagreements_navigation(dataset, tmp_path):
+    from db_manager import DB_Manager
+
+    path = str(tmp_path / 'disagreements.csv')
+    pd.DataFrame({'video_id': ['video01', 'video02', 'video03'], 'frame_id_int': [50, 100, 0]}).to_csv(path, index=False)
+
+    dbm = DB_Manager(dataset, str(tmp_path / 'annotations.pickle'))
+    assert not dbm.toggle_only_disagreements(True)
+    assert dbm.load_disagreements(path) == 2
+    assert dbm.toggle_only_disagreements(True)
+    rows = []
+    for _ in range(3):
+        dbm.next_frame()
+        rows.append(dbm.get_row())
+    assert rows == [2, 14, 2]
+
+    # the edits keep the index of the disagreements up to date
+    dbm.set_seen_flag(True)
+    dbm.toggle_skip_seen(True)
+    dbm.next_frame()
+    assert dbm.get_row() == 14
+    dbm.toggle_skip_seen(False)
+
+    assert not dbm.toggle_only_disagreements(False)
+    dbm.next_frame()
+    assert dbm.get_row() == 15
+    dbm.close()
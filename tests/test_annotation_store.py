@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+from annotation_store import Annotation_Store, flag_fields
+from dataset_sync import sync_store
+from db_manager import DB_Manager
+
+
+def test_flags_round_trip(tmp_path):
+    store = Annotation_Store.create(str(tmp_path / 'annotations'), ['video01'], [0, 0, 0], [0, 25, 50], [5, 5, 5])
+    store.set(1, 'seen', 1)
+    store.set(1, 'cvs_cri_3', 1)
+    store.set(2, 'artifact', 1)
+    store.set(2, 'artifact', 0)
+    store.set(2, 'comment', 'smoke')
+    store.close()
+
+    store = Annotation_Store(str(tmp_path / 'annotations'))
+    assert store.get(1, 'seen') == 1 and store.get(1, 'cvs_cri_3') == 1
+    assert sum(store.get(1, f) for f in flag_fields) == 2
+    assert sum(store.get(2, f) for f in flag_fields) == 0
+    assert store.get(2, 'comment') == 'smoke' and store.get(2, 'frame_id') == '00050'
+    store.close()
+
+
+def test_legacy_pickle_is_converted(dataset, tmp_path):
+    rows = [('video01', '{:05d}'.format(i * 25), i * 25) for i in range(10)] + \
+           [('video02', '{:05d}'.format(i * 25), i * 25) for i in range(10)]
+    df = pd.DataFrame(rows, columns=['video_id', 'frame_id', 'frame_id_int'])
+    for field_name in flag_fields:
+        df[field_name] = 0
+    df['comment'] = ''
+    df.loc[12, ['seen', 'cvs_cri_2', 'out_of_body']] = 1
+    df.loc[12, 'comment'] = 'smoke'
+    # rows of the former format are not sorted
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    df.iloc[::-1].to_pickle(annotation_path)
+
+    dbm = DB_Manager(dataset, annotation_path)
+    assert Annotation_Store.exists(dbm.store_path)
+    assert len(dbm.store) == 20
+    assert dbm.store.get(12, 'video_id') == 'video02' and dbm.store.get(12, 'frame_id') == '00050'
+    assert dbm.store.get_row(12) == df.loc[12].to_dict()
+    assert dbm.store.column('seen').sum() == 1
+    dbm.close()
+
+    # the exported snapshot is in the former format
+    exported = pd.read_pickle(annotation_path)
+    assert exported.loc[12].to_dict() == df.loc[12].to_dict()
+
+
+def test_missing_bit_round_trip(tmp_path):
+    store = Annotation_Store.create(str(tmp_path / 'annotations'), ['video01'], [0, 0, 0], [0, 25, 50], [5, 5, 5])
+    store.set(1, 'seen', 1)
+    store.set(1, 'cvs_cri_3', 1)
+    store.set(1, 'missing', 1)
+    store.set(2, 'missing', 1)
+    store.set(2, 'missing', 0)
+    store.close()
+
+    store = Annotation_Store(str(tmp_path / 'annotations'))
+    assert store.column('missing').tolist() == [0, 1, 0]
+    assert store.get(1, 'seen') == 1 and store.get(1, 'cvs_cri_3') == 1
+    # the status bits are not annotations
+    assert 'missing' not in store.get_row(1)
+    assert 'missing' not in store.to_dataframe().columns
+    store.close()
+
+
+def test_sync_keeps_the_labels(dataset, tmp_path):
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    dbm = DB_Manager(dataset, annotation_path)
+    dbm.goto_frame('video01', 50)
+    dbm.set_labels([1, 0, 1])
+    dbm.set_seen_flag(True)
+    dbm.set_comment('clip')
+    dbm.goto_frame('video02', 100)
+    dbm.set_labels([0, 1, 0])
+    dbm.set_seen_flag(True)
+    dbm.close()
+
+    # a frame is added before the labelled ones, another one removed
+    Image.new('RGB', (8, 6)).save(os.path.join(dataset, 'video01', '00010.png'))
+    os.remove(os.path.join(dataset, 'video02', '00075.png'))
+
+    dbm = DB_Manager(dataset, annotation_path)
+    assert len(dbm.store) == 21
+    row = dbm.frame_index.find('video01', 50)
+    assert row == 3
+    assert [dbm.store.get(row, f) for f in ('cvs_cri_1', 'cvs_cri_2', 'cvs_cri_3', 'seen')] == [1, 0, 1, 1]
+    assert dbm.store.get(row, 'comment') == 'clip'
+    row = dbm.frame_index.find('video02', 100)
+    assert [dbm.store.get(row, f) for f in ('cvs_cri_1', 'cvs_cri_2', 'cvs_cri_3', 'seen')] == [0, 1, 0, 1]
+    assert dbm.store.get(dbm.frame_index.find('video02', 75), 'missing') == 1
+    dbm.close()
+    assert not os.path.exists(dbm.store_path + '.old')
+
+
+def test_interrupted_replace_is_recovered(dataset, tmp_path):
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    dbm = DB_Manager(dataset, annotation_path)
+    dbm.goto_row(5)
+    dbm.set_seen_flag(True)
+    dbm.close()
+
+    # the process died between moving the live store aside and renaming the new one in
+    store_path = dbm.store_path
+    os.replace(store_path, store_path + '.old')
+
+    assert Annotation_Store.exists(store_path)
+    store = Annotation_Store(store_path)
+    assert not os.path.exists(store_path + '.old')
+    assert store.get(5, 'seen') == 1
+    store, n_added, _ = sync_store(store, dataset)
+    assert n_added == 0
+    assert np.count_nonzero(store.column('seen')) == 1
+    store.close()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import os
+
+from db_manager import DB_Manager
+from saver import Background_Saver
+
+
+def flag(dbm, row, field_name):
+    dbm.goto_row(row)
+    return int(dbm.get_frame()[field_name])
+
+
+def test_undo_is_bounded(dataset, legacy_annotations):
+    dbm = DB_Manager(dataset, legacy_annotations, max_undo=3)
+    for row in range(5):
+        dbm.goto_row(row)
+        dbm.set_seen_flag(True)
+    assert dbm.undo() and dbm.undo() and dbm.undo()
+    assert not dbm.undo()
+    # the two oldest edits are kept
+    assert [flag(dbm, row, 'seen') for row in range(5)] == [1, 1, 0, 0, 0]
+    dbm.close()
+
+
+def test_a_new_edit_clears_the_redo(dataset, legacy_annotations):
+    dbm = DB_Manager(dataset, legacy_annotations)
+    dbm.goto_row(2)
+    dbm.set_diff_flag(True)
+    dbm.set_artifact_flag(True)
+    assert dbm.undo()
+    assert flag(dbm, 2, 'artifact') == 0
+    dbm.set_instr_flag(True)
+    assert not dbm.redo()
+    assert [flag(dbm, 2, f) for f in ('difficult', 'artifact', 'instr_in_roi')] == [1, 0, 1]
+    dbm.close()
+
+
+def test_undo_goes_back_to_the_frame(dataset, legacy_annotations):
+    dbm = DB_Manager(dataset, legacy_annotations)
+    dbm.goto_frame('video01', 75)
+    dbm.set_seen_flag(True)
+    dbm.goto_frame('video02', 100)
+    assert dbm.undo()
+    assert dbm.get_id() == ('video01', 75)
+    assert dbm.get_frame()['seen'] == 0
+    dbm.goto_row(0)
+    assert dbm.redo()
+    assert dbm.get_row() == 3
+    assert dbm.get_frame()['seen'] == 1
+    dbm.close()
+
+
+def test_missing_first_frame(dataset, tmp_path):
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    DB_Manager(dataset, annotation_path).close()
+
+    os.rename(os.path.join(dataset, 'video01', '00000.png'), str(tmp_path / '00000.png'))
+    dbm = DB_Manager(dataset, annotation_path)
+    assert dbm.get_row() == 1
+    dbm.set_seen_flag(True)
+    dbm.close()
+
+    dbm = DB_Manager(dataset, annotation_path)
+    assert dbm.store.get(1, 'seen') == 1
+    dbm.close()
+
+
+def test_edits_are_saved(dataset, tmp_path):
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    dbm = DB_Manager(dataset, annotation_path)
+    dbm.goto_row(12)
+    dbm.set_labels([1, 0, 1])
+    dbm.set_seen_flag(True)
+    dbm.set_comment('clip')
+    dbm.close()
+
+    dbm = DB_Manager(dataset, annotation_path)
+    assert dbm.store.get_row(12)['cvs_cri_1'] == 1
+    assert dbm.store.get_row(12)['cvs_cri_3'] == 1
+    assert dbm.store.get(12, 'seen') == 1
+    assert dbm.store.get(12, 'comment') == 'clip'
+    dbm.close()
+
+
+class Failing_Journal:
+    """ journal whose first write fails """
+
+    def __init__(self):
+        self.records = []
+        self.n_calls = 0
+
+    def append_many(self, records):
+        self.n_calls += 1
+        if self.n_calls == 1:
+            raise OSError('disk full')
+        self.records += records
+
+
+class Memory_History:
+
+    def __init__(self):
+        self.deltas = []
+
+    def write(self, deltas):
+        self.deltas += deltas
+
+
+def test_saver_retry_does_not_repeat_the_history():
+    journal, history = Failing_Journal(), Memory_History()
+    saver = Background_Saver(journal, history, delay=0.01)
+    saver.submit(1, {'seen': 1}, {'row': 1})
+    saver.submit(2, {'seen': 1}, {'row': 2})
+    assert saver.flush(timeout=5)
+    saver.close()
+
+    assert history.deltas == [{'row': 1}, {'row': 2}]
+    assert journal.records == [(1, {'seen': 1}), (2, {'seen': 1})]
+
+
+class Read_Only_Journal:
+
+    def append_many(self, records):
+        raise OSError('read-only file system')
+
+
+def test_saver_gives_up_on_a_read_only_disk():
+    saver = Background_Saver(Read_Only_Journal(), Memory_History(), delay=0.01, max_retries=3)
+    saver.submit(1, {'seen': 1}, {'row': 1})
+    assert not saver.flush(timeout=5)
+    assert isinstance(saver.error, OSError)
+    assert saver.n_lost == 1
+    assert not saver.close(timeout=5)
+
+
+def test_close_writes_the_edits_the_saver_gave_up(dataset, tmp_path):
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    dbm = DB_Manager(dataset, annotation_path, save_delay=0.01)
+    dbm.saver.journal = Read_Only_Journal()
+    dbm.saver.max_retries = 1
+    dbm.goto_row(4)
+    dbm.set_seen_flag(True)
+    assert not dbm.flush()
+    assert dbm.close()
+
+    dbm = DB_Manager(dataset, annotation_path)
+    assert dbm.store.get(4, 'seen') == 1
+    dbm.close()
+
+
+def test_close_reports_a_snapshot_error(dataset, tmp_path):
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    dbm = DB_Manager(dataset, annotation_path)
+
+    def read_only():
+        raise OSError('read-only file system')
+    dbm.store.flush = read_only
+    assert not dbm.close()
+    # the annotations can be opened again
+    DB_Manager(dataset, annotation_path).close()
+
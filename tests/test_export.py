@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from db_manager import DB_Manager
+from export import export, open_annotations
+
+
+@pytest.fixture
+def annotations(dataset, tmp_path):
+    """ annotations with a seen frame, a seen out-of-body frame and a missing frame """
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    dbm = DB_Manager(dataset, annotation_path)
+    dbm.goto_row(2)
+    dbm.set_labels([1, 1, 0], seen=True)
+    dbm.set_comment('clip, "quoted"')
+    dbm.goto_row(14)
+    dbm.set_seen_flag(True)
+    dbm.set_oob_flag(True)
+    dbm.close()
+    os.remove(os.path.join(dataset, 'video02', '00000.png'))
+    DB_Manager(dataset, annotation_path).close()
+    return annotation_path
+
+
+def test_csv(annotations, tmp_path):
+    output = str(tmp_path / 'labels.csv')
+    assert export(annotations, output) == 19
+    df = pd.read_csv(output, dtype={'frame_id': str}, keep_default_na=False)
+    assert len(df) == 19
+    assert 0 not in df[df['video_id'] == 'video02']['frame_id_int'].tolist()
+    row = df[(df['video_id'] == 'video01') & (df['frame_id_int'] == 50)].iloc[0]
+    assert row['frame_id'] == '00050'
+    assert [row['cvs_cri_1'], row['cvs_cri_2'], row['cvs_cri_3'], row['seen']] == [1, 1, 0, 1]
+    assert row['comment'] == 'clip, "quoted"'
+
+
+def test_filters(annotations, tmp_path):
+    output = str(tmp_path / 'labels.jsonl')
+    assert export(annotations, output, seen_only=True) == 2
+    assert export(annotations, output, seen_only=True, exclude_out_of_body=True) == 1
+    df = pd.read_json(output, lines=True)
+    assert df[['video_id', 'frame_id_int']].values.tolist() == [['video01', 50]]
+    assert export(annotations, output, video_ids=['video02']) == 9
+
+
+def test_per_video(annotations, tmp_path):
+    output = str(tmp_path / 'labels')
+    assert export(annotations, output, fmt='csv', per_video=True, n_workers=2) == 19
+    assert sorted(os.listdir(output)) == ['video01.csv', 'video02.csv']
+    assert len(pd.read_csv(os.path.join(output, 'video02.csv'))) == 9
+
+
+def test_the_store_is_only_read(dataset, tmp_path):
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    dbm = DB_Manager(dataset, annotation_path, save_delay=None)
+    dbm.goto_row(5)
+    dbm.set_seen_flag(True)
+    store_path = dbm.store_path
+    # a store written before the file manifest existed
+    os.remove(os.path.join(store_path, 'ext_idx.npy'))
+    files = {name: os.path.getmtime(os.path.join(store_path, name)) for name in os.listdir(store_path)}
+
+    # the edit is only in the journal, the export sees it
+    store = open_annotations(annotation_path)
+    assert store.get(5, 'seen') == 1
+    export(annotation_path, str(tmp_path / 'labels.csv'))
+    assert {name: os.path.getmtime(os.path.join(store_path, name)) for name in os.listdir(store_path)} == files
+    assert not os.path.exists(os.path.join(store_path, 'ext_idx.npy'))
+    dbm.close()
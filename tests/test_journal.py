@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+from journal import Change_Journal
+
+
+def test_replay(tmp_path):
+    journal = Change_Journal(str(tmp_path / 'a.journal'))
+    journal.append(1, {'seen': 1})
+    journal.append_many([(2, {'difficult': 1}), (1, {'comment': 'x'})])
+    journal.close()
+
+    journal = Change_Journal(str(tmp_path / 'a.journal'))
+    assert list(journal.replay()) == [(1, {'seen': 1}), (2, {'difficult': 1}), (1, {'comment': 'x'})]
+    assert journal.n_records == 3
+    assert not journal.torn
+
+
+def test_missing_journal(tmp_path):
+    journal = Change_Journal(str(tmp_path / 'a.journal'))
+    assert list(journal.replay()) == []
+    assert not journal.torn
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    path = tmp_path / 'a.journal'
+    path.write_text('{"row": 1, "values": {"seen": 1}}\n{"row": 2, "val')
+    journal = Change_Journal(str(path))
+    assert list(journal.replay()) == [(1, {'seen': 1})]
+    assert journal.torn
+
+
+def test_appends_after_a_torn_first_record(tmp_path):
+    path = tmp_path / 'a.journal'
+    path.write_text('{"row": 1, "val')
+    journal = Change_Journal(str(path))
+    assert list(journal.replay()) == []
+
+    journal.append(2, {'seen': 1})
+    journal.append(3, {'seen': 1})
+    journal.close()
+
+    journal = Change_Journal(str(path))
+    assert list(journal.replay()) == [(2, {'seen': 1}), (3, {'seen': 1})]
+    assert journal.torn
+
+
+def test_db_manager_compacts_a_torn_journal(dataset, tmp_path):
+    from db_manager import DB_Manager
+
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    DB_Manager(dataset, annotation_path, save_delay=None).close()
+
+    journal_path = tmp_path / 'annotations.journal'
+    journal_path.write_text('{"row": 1, "val')
+    dbm = DB_Manager(dataset, annotation_path, save_delay=None)
+    assert journal_path.read_text() == ''
+
+    dbm.goto_row(3)
+    dbm.set_diff_flag(True)
+    # crash: the store is not compacted, and the lock goes with the process
+    dbm.journal.close()
+    dbm.lock.release()
+
+    dbm = DB_Manager(dataset, annotation_path, save_delay=None)
+    assert dbm.store.get(3, 'difficult') == 1
+    dbm.close()
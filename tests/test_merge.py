@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from annotation_store import flag_fields
+from merge import Aligned_Annotations, open_target, read_annotations, write_into
+
+c1 = flag_fields.index('cvs_cri_1')
+
+
+def annotations(frame_ids, seen, cvs_cri_1, video_id='video01'):
+    df = pd.DataFrame({'video_id': video_id, 'frame_id_int': frame_ids})
+    for field_name in flag_fields:
+        df[field_name] = 0
+    df['seen'] = seen
+    df['cvs_cri_1'] = cvs_cri_1
+    df['comment'] = ''
+    return df
+
+
+@pytest.fixture
+def aligned():
+    alice = annotations([0, 25, 50], seen=[1, 1, 0], cvs_cri_1=[1, 1, 1])
+    bob = annotations([0, 25, 50], seen=[1, 0, 0], cvs_cri_1=[0, 0, 0])
+    carol = annotations([0, 25, 75], seen=[1, 1, 1], cvs_cri_1=[0, 1, 1])
+    return Aligned_Annotations([alice, bob, carol])
+
+
+def test_alignment(aligned):
+    assert len(aligned) == 4
+    assert aligned.present.tolist() == [[True, True, True, False], [True, True, True, False], [True, True, False, True]]
+    assert (aligned.keys & 0xffffffff).tolist() == [0, 25, 50, 75]
+
+
+def test_conflicts_among_the_seen_inputs(aligned):
+    conflicts = aligned.conflicts()
+    # frame 25: bob has not seen it, alice and carol agree
+    assert conflicts[:, c1].tolist() == [True, False, False, False]
+    assert conflicts[:, [j for j in range(len(flag_fields)) if j != c1]].sum() == 0
+
+
+def test_prefer_seen(aligned):
+    merged, _ = aligned.merge('prefer_seen')
+    # frame 50 is seen by nobody, the first input that has it is used
+    assert merged[:, c1].tolist() == [1, 1, 1, 1]
+
+
+def test_majority(aligned):
+    merged, _ = aligned.merge('majority')
+    assert merged[:, c1].tolist() == [0, 1, 1, 1]
+
+
+def test_prefer_annotator(aligned):
+    merged, _ = aligned.merge('prefer_annotator', prefer=1)
+    assert merged[:, c1].tolist() == [0, 0, 0, 1]
+
+
+def test_scores_are_thresholded(tmp_path):
+    path = str(tmp_path / 'predictions.csv')
+    pd.DataFrame({'video_id': ['video01', 'video01'], 'frame_id_int': [0, 25], 'cvs_cri_1': [0.7, 0.2]}).to_csv(path, index=False)
+    aligned = Aligned_Annotations([read_annotations(path)])
+    assert aligned.values[0, :, c1].tolist() == [1, 0]
+    # fields the predictions do not have
+    assert (aligned.values[0, :, flag_fields.index('difficult')] == -1).all()
+
+
+def test_into_refuses_while_the_tool_is_open(dataset, tmp_path):
+    from db_manager import DB_Manager
+
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    dbm = DB_Manager(dataset, annotation_path)
+    with pytest.raises(AssertionError):
+        open_target(annotation_path)
+    dbm.close()
+
+    store, lock = open_target(annotation_path)
+    merged = np.zeros((len(store), len(flag_fields)), dtype=np.uint8)
+    merged[2, c1] = 1
+    comments = np.full(len(store), '', dtype=object)
+    assert write_into(store, merged, comments) == 1
+    store.close()
+    lock.release()
+
+    dbm = DB_Manager(dataset, annotation_path)
+    assert dbm.store.get(2, 'cvs_cri_1') == 1
+    dbm.close()
+
+
+def test_into_keeps_the_frames_the_annotator_has_seen(dataset, tmp_path, monkeypatch):
+    from db_manager import DB_Manager
+    import merge
+
+    annotation_path = str(tmp_path / 'annotations.pickle')
+    dbm = DB_Manager(dataset, annotation_path)
+    dbm.goto_frame('video01', 50)
+    dbm.set_labels([1, 1, 1])
+    dbm.set_seen_flag(1)
+    dbm.close()
+
+    path = str(tmp_path / 'other.csv')
+    other = annotations([50, 75], seen=[1, 1], cvs_cri_1=[0, 1])
+    other['cvs_cri_2'] = 0
+    other['cvs_cri_3'] = 0
+    other.to_csv(path, index=False)
+
+    monkeypatch.setattr('sys.argv', ['merge.py', '--inputs', path, '--into', annotation_path])
+    merge.main()
+
+    dbm = DB_Manager(dataset, annotation_path)
+    # frame 50 keeps the labels of the annotator, frame 75 gets those of the input
+    assert [dbm.store.get(2, f) for f in ['cvs_cri_1', 'cvs_cri_2', 'cvs_cri_3']] == [1, 1, 1]
+    assert dbm.store.get(3, 'cvs_cri_1') == 1
+    dbm.close()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from nav_index import Navigation_Index
+
+
+def scan(position, step, seen, difficult, order, filters):
+    """ frame by frame search of the former DB_Manager.next_frame/prev_frame """
+    skip_seen, only_seen, only_difficult = filters
+    n = len(seen)
+    for _ in range(n):
+        position = (position + step) % n
+        row = order[position]
+        if not (skip_seen and seen[row]) and not (only_difficult and not difficult[row]) \
+                and not (only_seen and not seen[row]):
+            return position
+    return position
+
+
+@pytest.mark.parametrize('filters', list(itertools.product([False, True], repeat=3)))
+def test_same_frames_as_the_scan(filters):
+    rng = np.random.default_rng(0)
+    n = 200
+    seen = rng.random(n) < 0.5
+    difficult = rng.random(n) < 0.2
+    shuffled_indices = rng.permutation(n)
+    shuffled_positions = np.empty(n, dtype=np.int64)
+    shuffled_positions[shuffled_indices] = np.arange(n)
+
+    nav_index = Navigation_Index(seen, difficult, shuffled_indices, shuffled_positions)
+    classes = nav_index.allowed_classes(*filters)
+
+    # edits move frames between the sets
+    for row in rng.choice(n, 20, replace=False):
+        seen[row] = not seen[row]
+        nav_index.update(row, seen[row], difficult[row])
+
+    for shuffled, order in ((False, np.arange(n)), (True, shuffled_indices)):
+        for position in range(n):
+            for step in (1, -1):
+                assert nav_index.find(position, step, shuffled, classes) == \
+                    scan(position, step, seen, difficult, order, filters)
+
+
+def test_no_matching_frame():
+    nav_index = Navigation_Index(np.zeros(5), np.zeros(5), np.arange(5), np.arange(5))
+    classes = nav_index.allowed_classes(False, True, False)
+    assert nav_index.find(3, 1, False, classes) == 3
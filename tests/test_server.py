@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+
+from client import Remote_DB_Manager
+from db_manager import DB_Manager
+from server import Annotation_Server
+
+
+@pytest.fixture
+def server(dataset, tmp_path):
+    """ (Annotation_Server, port) serving the dataset from a thread """
+    dbm = DB_Manager(dataset, str(tmp_path / 'annotations.pickle'))
+    server = Annotation_Server(dbm, n_workers=1)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    ports = []
+    stop = []
+
+    async def serve():
+        stop.append(asyncio.Event())
+        tcp_server = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        ports.append(tcp_server.sockets[0].getsockname()[1])
+        started.set()
+        async with tcp_server:
+            await stop[0].wait()
+            for writer in list(server._connections.values()):
+                writer.close()
+            await asyncio.gather(*server._connections, return_exceptions=True)
+
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), daemon=True)
+    thread.start()
+    assert started.wait(10)
+    yield server, ports[0]
+
+    loop.call_soon_threadsafe(stop[0].set)
+    thread.join(10)
+    loop.close()
+    server.close()
+
+
+def test_two_clients_have_their_own_frame(server):
+    server, port = server
+    alice = Remote_DB_Manager('127.0.0.1', port)
+    bob = Remote_DB_Manager('127.0.0.1', port)
+
+    alice.goto_frame('video01', '75')
+    bob.goto_frame('video02', '25')
+    alice.set_labels([1, 1, 1], True)
+    bob.toggle_skip_seen(True)
+    bob.next_frame()
+
+    assert alice.get_row() == 3
+    assert bob.get_row() == 12
+    assert server.dbm.store.get(3, 'cvs_cri_1') == 1
+    assert server.dbm.store.get(11, 'cvs_cri_1') == 0
+
+    # bob has nothing to undo, alice's edit stays
+    bob.undo()
+    assert server.dbm.store.get(3, 'cvs_cri_1') == 1
+    alice.undo()
+    assert server.dbm.store.get(3, 'cvs_cri_1') == 0
+    alice.close()
+    bob.close()
+
+
+def test_a_retried_call_is_applied_once(server):
+    server, port = server
+    client = Remote_DB_Manager('127.0.0.1', port)
+    body = json.dumps({'method': 'next_frame', 'args': [], 'id': 1000})
+    first = json.loads(client.request('POST', '/call', body))
+    second = json.loads(client.request('POST', '/call', body))
+    assert first == second
+    assert first['state']['row'] == 1
+    assert client.call('next_frame') is not None
+    assert client.get_row() == 2
+    client.close()
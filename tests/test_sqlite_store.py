@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+from db_manager import DB_Manager
+from sqlite_store import Sqlite_Store
+
+
+def labels(dbm, row):
+    return [dbm.store.get(row, f) for f in ('cvs_cri_1', 'cvs_cri_2', 'cvs_cri_3', 'seen')]
+
+
+def test_labels_per_annotator(dataset, tmp_path):
+    annotation_path = str(tmp_path / 'annotations.sqlite')
+    alice = DB_Manager(dataset, annotation_path, annotator='alice')
+    bob = DB_Manager(dataset, annotation_path, annotator='bob')
+
+    alice.goto_row(3)
+    alice.set_labels([1, 0, 1], seen=True)
+    alice.set_comment('clip')
+    bob.goto_row(3)
+    bob.set_labels([0, 1, 0], seen=True)
+    bob.goto_row(12)
+    bob.set_seen_flag(True)
+    alice.close()
+    bob.close()
+
+    alice = DB_Manager(dataset, annotation_path, annotator='alice')
+    assert labels(alice, 3) == [1, 0, 1, 1]
+    assert alice.store.get(3, 'comment') == 'clip'
+    assert alice.store.get(12, 'seen') == 0
+    alice.close()
+
+    bob = DB_Manager(dataset, annotation_path, annotator='bob')
+    assert labels(bob, 3) == [0, 1, 0, 1]
+    assert bob.store.get(3, 'comment') == ''
+    assert bob.store.get(12, 'seen') == 1
+    bob.close()
+
+    # an annotator who has not started has no labels
+    carol = Sqlite_Store(annotation_path, 'carol')
+    assert carol.column('seen').sum() == 0
+    carol.close()
+
+
+def test_encode_extensions(dataset, tmp_path):
+    store = Sqlite_Store(str(tmp_path / 'annotations.sqlite'), 'alice')
+    store.sync(dataset)
+    assert store.extensions == ['png']
+    assert store.encode_extensions(['jpg', 'png']).tolist() == [1, 0]
+    assert store.extensions == ['png', 'jpg']
+    store.close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+(c) Research Group CAMMA, University of Strasbourg, France
+Website: http://camma.u-strasbg.fr
+"""
+
+import json
+import os
+import threading
+
+
+def probe_video(path):
+    """ fps, number of frames and duration in seconds of a video file """
+    # OpenCV takes a while to import, it is only needed once a video is opened
+    import cv2
+    cam = cv2.VideoCapture(path)
+    try:
+        fps = cam.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cam.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cam.release()
+    duration = frame_count / fps if fps > 0 else 0.
+    return {'fps': fps, 'frame_count': frame_count, 'duration': duration}
+
+
+class Video_Index:
+    """ Persistent metadata of the videos of `videos_dir`: file name -> path,
+    fps, frame count and duration.
+
+    Entries are kept in a json file and reused as long as the mtime and size
+    of the video do not change, so a video is opened with OpenCV only once.
+    build_async() refreshes the whole folder in a background thread. """
+
+    def __init__(self, videos_dir, cache_path):
+        self.videos_dir = videos_dir
+        self.cache_path = cache_path
+
+        self.videos = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get('videos_dir') == self.videos_dir:
+                self.videos = cache['videos']
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        with self._lock:
+            cache = {'videos_dir': self.videos_dir, 'videos': dict(self.videos)}
+        with open(self.cache_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(cache, f, indent=1)
+        os.replace(self.cache_path + '.tmp', self.cache_path)
+
+    def _update_entry(self, file_name, st):
+        """ cached entry of a video, probed again if the file changed """
+        with self._lock:
+            entry = self.videos.get(file_name)
+        if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return entry, False
+
+        path = os.path.join(self.videos_dir, file_name)
+        entry = probe_video(path)
+        entry.update({'path': path, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size})
+        with self._lock:
+            self.videos[file_name] = entry
+        return entry, True
+
+    def build(self):
+        """ index every file of the folder, drop the entries of deleted files """
+        changed = False
+        found = set()
+        with os.scandir(self.videos_dir) as it:
+            for dir_entry in it:
+                if not dir_entry.is_file():
+                    continue
+                found.add(dir_entry.name)
+                try:
+                    _, probed = self._update_entry(dir_entry.name, dir_entry.stat())
+                except Exception as e:
+                    print('WARNING: could not read video ', dir_entry.path, e)
+                    continue
+                changed = changed or probed
+
+        with self._lock:
+            for file_name in [f for f in self.videos if f not in found]:
+                del self.videos[file_name]
+                changed = True
+
+        if changed:
+            self.save()
+
+    def build_async(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self.build, name='video-index', daemon=True)
+        self._thread.start()
+
+    def lookup(self, video_id):
+        """ entry of the video file whose name starts with `video_id`.
+        Raises LookupError if there is none or more than one """
+        with self._lock:
+            candidates = [f for f in self.videos if f.startswith(video_id)]
+
+        if len(candidates) == 0:
+            # not indexed yet, look at the folder itself
+            candidates = [f for f in os.listdir(self.videos_dir) if f.startswith(video_id)]
+
+        if len(candidates) > 1:
+            raise LookupError('Multiple files found {}'.format(candidates))
+        if len(candidates) == 0:
+            raise LookupError('File not found : {}'.format(os.path.join(self.videos_dir, video_id + '*')))
+
+        file_name = candidates[0]
+        try:
+            st = os.stat(os.path.join(self.videos_dir, file_name))
+        except OSError:
+            with self._lock:
+                self.videos.pop(file_name, None)
+            raise LookupError('File not found : {}'.format(os.path.join(self.videos_dir, file_name)))
+
+        entry, probed = self._update_entry(file_name, st)
+        if probed:
+            self.save()
+        return entry